@@ -1,94 +1,165 @@
 #!/usr/bin/env python3
 """
 Database migration script to add ai_satisfies_rubric column to grades table
+and the indexes used by grade/submission lookups
 """
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from app.core.database import engine, SessionLocal
 from app.models.grade import Grade
 
+# Grades are backfilled in id ranges of this size, committing after each batch
+BACKFILL_BATCH_SIZE = 5_000
+
+# Update existing records - assume they don't satisfy rubric if they have feedback.
+# PostgreSQL/MySQL join submissions/assignments once instead of running a correlated
+# subquery per grade row; SQLite keeps the simpler feedback-only heuristic. Only rows
+# still NULL are touched, so a rerun after a failure picks up where it stopped, and
+# max_points values that aren't numbers fall back to 10 instead of failing the cast.
+BACKFILL_SQL = {
+    "postgresql": """
+        UPDATE grades g
+        SET ai_satisfies_rubric = (
+            g.ai_score = COALESCE(
+                CASE WHEN (a.rubric_json -> g.question_no ->> 'max_points') ~ '^-?[0-9]+([.][0-9]+)?$'
+                    THEN (a.rubric_json -> g.question_no ->> 'max_points')::numeric
+                END,
+                10
+            )
+            AND (g.ai_feedback IS NULL OR g.ai_feedback = '')
+        )
+        FROM submissions s
+        JOIN assignments a ON a.id = s.assignment_id
+        WHERE s.id = g.submission_id AND g.id BETWEEN :first_id AND :last_id
+            AND g.ai_satisfies_rubric IS NULL
+    """,
+    "mysql": """
+        UPDATE grades g
+        JOIN submissions s ON s.id = g.submission_id
+        JOIN assignments a ON a.id = s.assignment_id
+        SET g.ai_satisfies_rubric = CASE 
+            WHEN g.ai_score = COALESCE(
+                CASE WHEN JSON_UNQUOTE(JSON_EXTRACT(a.rubric_json, CONCAT('$.', g.question_no, '.max_points')))
+                        REGEXP '^-?[0-9]+([.][0-9]+)?$'
+                    THEN CAST(JSON_UNQUOTE(JSON_EXTRACT(a.rubric_json, CONCAT('$.', g.question_no, '.max_points'))) AS DECIMAL(10, 2))
+                END,
+                10
+            ) AND (g.ai_feedback IS NULL OR g.ai_feedback = '') 
+            THEN TRUE 
+            ELSE FALSE 
+        END
+        WHERE g.id BETWEEN :first_id AND :last_id AND g.ai_satisfies_rubric IS NULL
+    """,
+    "sqlite": """
+        UPDATE grades 
+        SET ai_satisfies_rubric = CASE 
+            WHEN ai_feedback IS NULL OR ai_feedback = '' THEN 1 
+            ELSE 0 
+        END
+        WHERE id BETWEEN :first_id AND :last_id AND ai_satisfies_rubric IS NULL
+    """,
+}
+
 def add_satisfies_rubric_column():
-    """Add ai_satisfies_rubric column to grades table"""
+    """Add ai_satisfies_rubric column to grades table and backfill existing grades"""
+    # Check if column already exists with a single introspection call
+    columns = {column["name"] for column in inspect(engine).get_columns("grades")}
+    
+    dialect = engine.dialect.name
     db = SessionLocal()
     
     try:
-        # Check if column already exists
-        result = db.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='grades' AND column_name='ai_satisfies_rubric'
-        """))
-        
-        if result.fetchone():
+        if "ai_satisfies_rubric" in columns:
             print("Column ai_satisfies_rubric already exists in grades table")
-            return
-        
-        # Add the column
-        db.execute(text("""
-            ALTER TABLE grades 
-            ADD COLUMN ai_satisfies_rubric BOOLEAN DEFAULT FALSE
-        """))
-        
-        # Update existing records - assume they don't satisfy rubric if they have feedback
-        db.execute(text("""
-            UPDATE grades 
-            SET ai_satisfies_rubric = CASE 
-                WHEN ai_score = (
-                    SELECT COALESCE(
-                        CAST(JSON_EXTRACT(rubric_json, CONCAT('$.', question_no, '.max_points')) AS UNSIGNED), 
-                        10
-                    )
-                    FROM assignments a 
-                    JOIN submissions s ON s.assignment_id = a.id 
-                    WHERE s.id = grades.submission_id
-                ) AND (ai_feedback IS NULL OR ai_feedback = '') 
-                THEN TRUE 
-                ELSE FALSE 
-            END
-        """))
+        else:
+            # No database default: existing rows stay NULL until the backfill reaches
+            # them, while the application always writes the column for new grades
+            db.execute(text("ALTER TABLE grades ADD COLUMN ai_satisfies_rubric BOOLEAN"))
+            db.commit()
+            print("Successfully added ai_satisfies_rubric column to grades table")
         
-        db.commit()
-        print("Successfully added ai_satisfies_rubric column to grades table")
+        # Backfill in bounded batches so one giant transaction doesn't bloat the
+        # WAL or hold table-wide locks
+        backfill = text(BACKFILL_SQL.get(dialect, BACKFILL_SQL["mysql"]))
+        min_id, max_id = db.execute(text(
+            "SELECT MIN(id), MAX(id) FROM grades WHERE ai_satisfies_rubric IS NULL"
+        )).one()
+        if min_id is not None:
+            for first_id in range(min_id, max_id + 1, BACKFILL_BATCH_SIZE):
+                db.execute(backfill, {"first_id": first_id, "last_id": first_id + BACKFILL_BATCH_SIZE - 1})
+                db.commit()
+            print("Successfully backfilled ai_satisfies_rubric")
         
     except Exception as e:
+        print(f"Error adding column: {e}")
+        print("Batches committed so far are kept; rerun the script to resume the backfill")
         db.rollback()
-        # For SQLite, try a different approach
-        if "information_schema" in str(e):
-            try:
-                # SQLite approach
-                db.execute(text("ALTER TABLE grades ADD COLUMN ai_satisfies_rubric BOOLEAN DEFAULT 0"))
-                
-                # Update existing records for SQLite
-                db.execute(text("""
-                    UPDATE grades 
-                    SET ai_satisfies_rubric = 0
-                    WHERE ai_feedback IS NOT NULL AND ai_feedback != ''
-                """))
-                
-                db.execute(text("""
-                    UPDATE grades 
-                    SET ai_satisfies_rubric = 1
-                    WHERE ai_feedback IS NULL OR ai_feedback = ''
-                """))
-                
-                db.commit()
-                print("Successfully added ai_satisfies_rubric column to grades table (SQLite)")
-                
-            except Exception as sqlite_e:
-                if "duplicate column" in str(sqlite_e).lower():
-                    print("Column ai_satisfies_rubric already exists in grades table")
-                else:
-                    print(f"Error adding column: {sqlite_e}")
-                    db.rollback()
-        else:
-            print(f"Error adding column: {e}")
-            db.rollback()
     
     finally:
         db.close()
 
+# (table, index name, columns, unique) - keep in sync with the model definitions
+LOOKUP_INDEXES = [
+    ("grades", "ix_grades_submission_id", ["submission_id"], False),
+    ("submissions", "ix_submissions_assignment_student", ["assignment_id", "student_id"], True),
+    ("submissions", "ix_submissions_file_path", ["file_path"], False),
+]
+
+def _invalid_indexes(conn) -> set:
+    """Names of PostgreSQL indexes left INVALID by a failed CREATE INDEX CONCURRENTLY"""
+    if engine.dialect.name != "postgresql":
+        return set()
+    
+    return set(conn.execute(text("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid
+    """)).scalars())
+
+def _duplicate_count(conn, table: str, columns: list) -> int:
+    """Number of distinct column values held by more than one row"""
+    column_list = ", ".join(columns)
+    return conn.execute(text(f"""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1
+        ) duplicates
+    """)).scalar()
+
+def add_lookup_indexes():
+    """Add indexes on grades(submission_id), submissions(file_path) and a unique submissions(assignment_id, student_id)"""
+    inspector = inspect(engine)
+    concurrently = "CONCURRENTLY " if engine.dialect.name == "postgresql" else ""
+    
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = _invalid_indexes(conn)
+        for table, name, columns, unique in LOOKUP_INDEXES:
+            existing = {index["name"] for index in inspector.get_indexes(table)}
+            if name in existing and name not in invalid:
+                print(f"Index {name} already exists on {table} table")
+                continue
+            
+            # An invalid index enforces nothing, so rebuild it
+            if name in invalid:
+                conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
+                print(f"Dropped invalid index {name} on {table} table")
+            
+            # Application code used to be the only guard against duplicate submissions
+            if unique:
+                duplicates = _duplicate_count(conn, table, columns)
+                if duplicates:
+                    print(
+                        f"Cannot create unique index {name}: {duplicates} ({', '.join(columns)}) "
+                        f"values appear in more than one {table} row. Remove the duplicates and rerun."
+                    )
+                    sys.exit(1)
+            
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            conn.execute(text(f"CREATE {kind} {concurrently}{name} ON {table} ({', '.join(columns)})"))
+            print(f"Successfully created index {name} on {table} table")
+
 if __name__ == "__main__":
     add_satisfies_rubric_column()
+    add_lookup_indexes()
@@ -1,19 +1,35 @@
+import asyncio
+import codecs
 import os
+import threading
 import uuid
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session, defer
 from pydantic import BaseModel
 from ..core.database import get_db
-from ..core.auth import get_current_user
+from ..core.auth import Principal, get_current_principal, require_staff
 from ..core.config import settings
-from ..models.user import User, UserRole
+from ..models.user import UserRole
 from ..models.assignment import Assignment
 from ..services.llm_service import parse_assignment_documents, DocumentParseResult
 from ..services.latex_parser import LatexParser
 
 router = APIRouter()
 
+# Stateless, so one instance serves every request
+_latex_parser = LatexParser()
+
+# Serialized assignments keyed by (id, version). Assignments rarely change, so hot
+# GETs skip reloading and re-serializing the rubric/answer key JSON.
+ASSIGNMENT_CACHE_SIZE = 256
+_assignment_cache: "OrderedDict[Tuple[int, float], dict]" = OrderedDict()
+_assignment_cache_lock = threading.Lock()
+
 
 class AssignmentCreate(BaseModel):
     name: str
@@ -36,6 +52,17 @@ class AssignmentResponse(BaseModel):
         orm_mode = True
 
 
+class AssignmentSummaryResponse(BaseModel):
+    id: int
+    name: str
+    description: str
+    max_points: int
+    instructor_id: int
+
+    class Config:
+        orm_mode = True
+
+
 class ParsedAssignmentResponse(BaseModel):
     assignment: Optional[DocumentParseResult] = None
     answer_key: Optional[DocumentParseResult] = None
@@ -45,16 +72,10 @@ class ParsedAssignmentResponse(BaseModel):
 @router.post("/", response_model=AssignmentResponse)
 def create_assignment(
     assignment_data: AssignmentCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Create a new assignment (instructors only)"""
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only instructors and TAs can create assignments"
-        )
-    
     assignment = Assignment(
         name=assignment_data.name,
         description=assignment_data.description,
@@ -71,78 +92,143 @@ def create_assignment(
     return assignment
 
 
-@router.get("/", response_model=List[AssignmentResponse])
+@router.get("/", response_model=List[AssignmentSummaryResponse])
 def list_assignments(
-    current_user: User = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    """List all assignments"""
+    """List assignments (without rubric/answer key - fetch a single assignment for those)"""
+    query = db.query(Assignment).options(
+        defer(Assignment.rubric_json),
+        defer(Assignment.answer_key_json)
+    )
+    
     if current_user.role == UserRole.INSTRUCTOR:
         # Instructors see their own assignments
-        assignments = db.query(Assignment).filter(Assignment.instructor_id == current_user.id).all()
-    elif current_user.role == UserRole.TA:
-        # TAs see all assignments (for now - could be filtered by course later)
-        assignments = db.query(Assignment).all()
-    else:
-        # Students see all assignments
-        assignments = db.query(Assignment).all()
+        query = query.filter(Assignment.instructor_id == current_user.id)
+    # TAs see all assignments (for now - could be filtered by course later)
+    # Students see all assignments
+    
+    # Every assignment unless the client asks for a page
+    assignments = query.order_by(Assignment.id).offset(offset).limit(limit).all()
     
     return assignments
 
 
+def _assignment_version(updated_at: Optional[datetime], created_at: Optional[datetime]) -> float:
+    """Version stamp for an assignment, bumped whenever it is updated"""
+    changed_at = updated_at or created_at
+    return changed_at.timestamp() if changed_at else 0.0
+
+
+def _get_cached_assignment(db: Session, assignment_id: int, version: float) -> Optional[dict]:
+    """Return the serialized assignment, loading it only on a cache miss"""
+    key = (assignment_id, version)
+    with _assignment_cache_lock:
+        payload = _assignment_cache.get(key)
+        if payload is not None:
+            _assignment_cache.move_to_end(key)
+            return payload
+    
+    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    if not assignment:
+        return None
+    
+    payload = AssignmentResponse.model_validate(assignment).model_dump()
+    with _assignment_cache_lock:
+        _assignment_cache[key] = payload
+        if len(_assignment_cache) > ASSIGNMENT_CACHE_SIZE:
+            _assignment_cache.popitem(last=False)
+    
+    return payload
+
+
 @router.get("/{assignment_id}", response_model=AssignmentResponse)
 def get_assignment(
     assignment_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get a specific assignment"""
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
-    if not assignment:
+    # Only fetch the timestamps to decide whether the client/cache copy is current
+    timestamps = db.query(Assignment.updated_at, Assignment.created_at).filter(
+        Assignment.id == assignment_id
+    ).first()
+    if not timestamps:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Assignment not found"
         )
     
-    # For students, don't show answer key
-    if current_user.role == UserRole.STUDENT:
-        assignment.answer_key_json = {}
+    version = _assignment_version(*timestamps)
+    is_student = current_user.role == UserRole.STUDENT
+    # Students get a different representation (no answer key), so tag it separately
+    etag = f'"{assignment_id}-{version}{"-student" if is_student else ""}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     
-    return assignment
+    payload = _get_cached_assignment(db, assignment_id, version)
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
+        )
+    
+    # For students, don't show answer key. Blank it on a copy of the response rather
+    # than the ORM instance, which would mark it dirty and risk flushing the empty dict.
+    if is_student:
+        return {**payload, "answer_key_json": {}}
+    
+    return payload
 
 
 @router.put("/{assignment_id}", response_model=AssignmentResponse)
 def update_assignment(
     assignment_id: int,
     assignment_data: AssignmentCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Update an assignment (instructors only)"""
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
-    if not assignment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Assignment not found"
-        )
+    # Update and fetch in one statement; the ownership check is part of the WHERE clause.
+    # updated_at is bumped explicitly so cached copies/ETags are invalidated even within
+    # the same second.
+    stmt = update(Assignment).where(
+        Assignment.id == assignment_id,
+        Assignment.instructor_id == current_user.id
+    ).values(
+        name=assignment_data.name,
+        description=assignment_data.description,
+        rubric_json=assignment_data.rubric_json,
+        answer_key_json=assignment_data.answer_key_json,
+        max_points=assignment_data.max_points,
+        updated_at=datetime.now(timezone.utc)
+    ).returning(Assignment)
     
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA] or assignment.instructor_id != current_user.id:
+    assignment = db.scalars(stmt).first()
+    if assignment is None:
+        # Nothing updated - work out whether it's missing or someone else's
+        exists = db.query(Assignment.id).filter(Assignment.id == assignment_id).first()
+        if not exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Assignment not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only the assignment instructor can update it"
         )
     
-    # Update assignment fields
-    assignment.name = assignment_data.name
-    assignment.description = assignment_data.description
-    assignment.rubric_json = assignment_data.rubric_json
-    assignment.answer_key_json = assignment_data.answer_key_json
-    assignment.max_points = assignment_data.max_points
-    
+    # Serialize before committing so the expired instance isn't reloaded
+    payload = AssignmentResponse.model_validate(assignment).model_dump()
     db.commit()
-    db.refresh(assignment)
     
-    return assignment
+    return payload
 
 
 @router.post("/parse-files", response_model=ParsedAssignmentResponse)
@@ -150,15 +236,9 @@ async def parse_assignment_files(
     assignment_file: Optional[UploadFile] = File(None),
     answer_key_file: Optional[UploadFile] = File(None),
     rubric_file: Optional[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(require_staff),
 ):
     """Parse uploaded assignment files using LLM to extract structured questions"""
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only instructors and TAs can parse assignment files"
-        )
-    
     # Helper function to read file content
     async def read_file_content(file: Optional[UploadFile]) -> str:
         if not file:
@@ -171,44 +251,56 @@ async def parse_assignment_files(
                 detail=f"File {file.filename} must be a .tex or .txt file"
             )
         
-        content = await file.read()
+        # Read in chunks so oversize uploads fail fast instead of being buffered whole
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        chunks = []
+        total_bytes = 0
         try:
-            return content.decode('utf-8')
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                total_bytes += len(chunk)
+                if total_bytes > settings.MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File {file.filename} exceeds the {settings.MAX_UPLOAD_BYTES} byte upload limit"
+                    )
+                chunks.append(decoder.decode(chunk))
+            chunks.append(decoder.decode(b'', final=True))
         except UnicodeDecodeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"File {file.filename} contains invalid UTF-8 encoding"
             )
+        
+        return ''.join(chunks)
     
-    # Read file contents
-    assignment_content = await read_file_content(assignment_file)
-    answer_key_content = await read_file_content(answer_key_file)
-    rubric_content = await read_file_content(rubric_file)
+    # Read file contents concurrently
+    assignment_content, answer_key_content, rubric_content = await asyncio.gather(
+        read_file_content(assignment_file),
+        read_file_content(answer_key_file),
+        read_file_content(rubric_file)
+    )
     
     # If LaTeX files, try to clean them first
-    latex_parser = LatexParser()
-    
-    if assignment_content and assignment_file and assignment_file.filename.endswith('.tex'):
-        try:
-            assignment_content = latex_parser._clean_latex_content(assignment_content)
-        except:
-            pass  # Use original content if cleaning fails
-    
-    if answer_key_content and answer_key_file and answer_key_file.filename.endswith('.tex'):
+    async def clean_latex_content(content: str, file: Optional[UploadFile]) -> str:
+        if not (content and file and file.filename.endswith('.tex')):
+            return content
+        
+        # Regex cleaning is CPU-bound, so keep it off the event loop
         try:
-            answer_key_content = latex_parser._clean_latex_content(answer_key_content)
-        except:
-            pass
+            return await asyncio.to_thread(_latex_parser._clean_latex_content, content)
+        except Exception:
+            return content  # Use original content if cleaning fails
     
-    if rubric_content and rubric_file and rubric_file.filename.endswith('.tex'):
-        try:
-            rubric_content = latex_parser._clean_latex_content(rubric_content)
-        except:
-            pass
+    assignment_content, answer_key_content, rubric_content = await asyncio.gather(
+        clean_latex_content(assignment_content, assignment_file),
+        clean_latex_content(answer_key_content, answer_key_file),
+        clean_latex_content(rubric_content, rubric_file)
+    )
     
-    # Parse documents using LLM
+    # Parse documents using LLM, in a worker thread since the calls block
     try:
-        parsed_results = parse_assignment_documents(
+        parsed_results = await asyncio.to_thread(
+            parse_assignment_documents,
             assignment_content=assignment_content,
             answer_key_content=answer_key_content,
             rubric_content=rubric_content
@@ -228,24 +320,31 @@ async def parse_assignment_files(
         )
 
 
+def _index_parsed_entries(document: Optional[dict]) -> dict:
+    """Map "q<id>" to each question and subpart of a parsed document"""
+    index = {}
+    if not document:
+        return index
+    
+    for question in document.get("questions", []):
+        index[f"q{question['id']}"] = question
+        for part in question.get("parts", []):
+            index[f"q{part['id']}"] = part
+    
+    return index
+
+
 @router.post("/create-from-parsed", response_model=AssignmentResponse)
 def create_assignment_from_parsed(
     name: str = Form(...),
     description: str = Form(""),
     parsed_data: str = Form(...),  # JSON string of parsed assignment data
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Create an assignment from parsed document data"""
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only instructors and TAs can create assignments"
-        )
-    
     try:
-        import json
-        parsed_json = json.loads(parsed_data)
+        parsed_json = orjson.loads(parsed_data)
         
         # Extract rubric and answer key from parsed data
         rubric_json = {}
@@ -262,68 +361,45 @@ def create_assignment_from_parsed(
         else:
             assignment_questions = []
         
+        # Index the rubric and answer key documents once so each entry is merged by lookup
+        rubric_index = _index_parsed_entries(parsed_json.get("rubric"))
+        answer_key_index = _index_parsed_entries(parsed_json.get("answer_key"))
+        
         for question in assignment_questions:
-            q_id = question["id"]
-            max_points = question.get("max_points", 10)
-            total_points += max_points
+            # Questions default to 10 points, subparts to 5
+            entries = [(question, 10)] + [(part, 5) for part in question.get("parts", [])]
             
-            # Build rubric entry
-            rubric_json[f"q{q_id}"] = {
-                "question_text": question.get("question_text", ""),
-                "max_points": max_points,
-                "criteria": question.get("rubric_text", "Grade based on correctness and completeness")
-            }
-            
-            # Build answer key entry
-            answer_key_json[f"q{q_id}"] = question.get("answer_text", "")
-            
-            # Handle subparts
-            for part in question.get("parts", []):
-                part_id = part["id"]
-                part_points = part.get("max_points", 5)
-                total_points += part_points
+            for entry, default_points in entries:
+                entry_id = f"q{entry['id']}"
+                max_points = entry.get("max_points", default_points)
+                total_points += max_points
                 
-                rubric_json[f"q{part_id}"] = {
-                    "question_text": part.get("question_text", ""),
-                    "max_points": part_points,
-                    "criteria": part.get("rubric_text", "Grade based on correctness and completeness")
+                # Build rubric entry
+                rubric_entry = {
+                    "question_text": entry.get("question_text", ""),
+                    "max_points": max_points,
+                    "criteria": entry.get("rubric_text", "Grade based on correctness and completeness")
                 }
                 
-                answer_key_json[f"q{part_id}"] = part.get("answer_text", "")
-        
-        # Merge data from rubric document if available
-        if "rubric" in parsed_json and parsed_json["rubric"]:
-            for question in parsed_json["rubric"].get("questions", []):
-                q_id = f"q{question['id']}"
-                if q_id in rubric_json:
+                # Merge data from rubric document if available
+                rubric_source = rubric_index.get(entry_id)
+                if rubric_source is not None:
                     # Update question text if available
-                    if question.get("question_text"):
-                        rubric_json[q_id]["question_text"] = question["question_text"]
-                    rubric_json[q_id]["criteria"] = question.get("rubric_text", rubric_json[q_id]["criteria"])
-                    if question.get("max_points"):
-                        rubric_json[q_id]["max_points"] = question["max_points"]
+                    if rubric_source.get("question_text"):
+                        rubric_entry["question_text"] = rubric_source["question_text"]
+                    if "rubric_text" in rubric_source:
+                        rubric_entry["criteria"] = rubric_source["rubric_text"]
+                    if rubric_source.get("max_points"):
+                        rubric_entry["max_points"] = rubric_source["max_points"]
                 
-                for part in question.get("parts", []):
-                    part_id = f"q{part['id']}"
-                    if part_id in rubric_json:
-                        # Update question text if available
-                        if part.get("question_text"):
-                            rubric_json[part_id]["question_text"] = part["question_text"]
-                        rubric_json[part_id]["criteria"] = part.get("rubric_text", rubric_json[part_id]["criteria"])
-                        if part.get("max_points"):
-                            rubric_json[part_id]["max_points"] = part["max_points"]
-        
-        # Merge data from answer key document if available
-        if "answer_key" in parsed_json and parsed_json["answer_key"]:
-            for question in parsed_json["answer_key"].get("questions", []):
-                q_id = f"q{question['id']}"
-                if q_id in answer_key_json:
-                    answer_key_json[q_id] = question.get("answer_text", answer_key_json[q_id])
+                # Build answer key entry, preferring the answer key document if available
+                answer_text = entry.get("answer_text", "")
+                answer_source = answer_key_index.get(entry_id)
+                if answer_source is not None and "answer_text" in answer_source:
+                    answer_text = answer_source["answer_text"]
                 
-                for part in question.get("parts", []):
-                    part_id = f"q{part['id']}"
-                    if part_id in answer_key_json:
-                        answer_key_json[part_id] = part.get("answer_text", answer_key_json[part_id])
+                rubric_json[entry_id] = rubric_entry
+                answer_key_json[entry_id] = answer_text
         
         # Create assignment
         assignment = Assignment(
@@ -341,7 +417,7 @@ def create_assignment_from_parsed(
         
         return assignment
         
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid JSON in parsed data"
@@ -1,9 +1,10 @@
+import asyncio
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from ..core.database import get_db
+from ..core.database import get_db, dialect_insert
 from ..core.auth import authenticate_user, create_access_token, get_password_hash
 from ..core.config import settings
 from ..models.user import User, UserRole
@@ -34,37 +35,46 @@ class Token(BaseModel):
     user: UserResponse
 
 
+def _insert_user(db: Session, stmt):
+    """Run the user insert, committing only if a row was created"""
+    row = db.execute(stmt).first()
+    if row is not None:
+        db.commit()
+    return row
+
+
 @router.post("/register", response_model=UserResponse)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+    # Hashing is deliberately slow, so keep it off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
     
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    user = User(
+    # Insert in one round trip; the unique index on users.email rejects duplicates
+    # atomically, so there's no check-then-insert race
+    stmt = dialect_insert(User).values(
         email=user_data.email,
         name=user_data.name,
         role=user_data.role,
         hashed_password=hashed_password
-    )
+    ).on_conflict_do_nothing(
+        index_elements=[User.email]
+    ).returning(User.id, User.email, User.name, User.role)
     
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    # The session is synchronous, so run the insert on a worker thread
+    row = await asyncio.to_thread(_insert_user, db, stmt)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
-    return user
+    return dict(row._mapping)
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login user and return access token"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,11 +84,17 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id, "role": user.role.value},
+        expires_delta=access_token_expires
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": user
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "name": user.name,
+            "role": user.role
+        }
     }
@@ -1,9 +1,11 @@
+from itertools import groupby
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from ..core.database import get_db
-from ..core.auth import get_current_user
+from ..core.auth import Principal, get_current_principal, require_staff
 from ..models.user import User, UserRole
 from ..models.submission import Submission
 from ..models.grade import Grade
@@ -34,7 +36,7 @@ class GradeUpdate(BaseModel):
 @router.get("/submission/{submission_id}", response_model=List[GradeResponse])
 def get_grades_for_submission(
     submission_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get all grades for a specific submission"""
@@ -61,7 +63,7 @@ def get_grades_for_submission(
 @router.get("/{grade_id}", response_model=GradeResponse)
 def get_grade(
     grade_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get a specific grade"""
@@ -88,74 +90,83 @@ def get_grade(
 def update_grade(
     grade_id: int,
     grade_update: GradeUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Update a grade (instructors and TAs only)"""
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only instructors and TAs can update grades"
-        )
-    
-    grade = db.query(Grade).filter(Grade.id == grade_id).first()
+    # Update grade
+    grade = db.scalars(
+        update(Grade).where(Grade.id == grade_id).values(
+            final_score=grade_update.final_score,
+            final_feedback=grade_update.final_feedback,
+            human_reviewed=True,
+            reviewed_by=current_user.id
+        ).returning(Grade)
+    ).first()
     if not grade:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Grade not found"
         )
     
-    # Update grade
-    grade.final_score = grade_update.final_score
-    grade.final_feedback = grade_update.final_feedback
-    grade.human_reviewed = True
-    grade.reviewed_by = current_user.id
+    # Update submission total score in the same transaction with a single aggregate,
+    # so the total is never stale and there's only one commit
+    db.execute(
+        update(Submission).where(Submission.id == grade.submission_id).values(
+            total_score=select(func.coalesce(func.sum(Grade.final_score), 0)).where(
+                Grade.submission_id == grade.submission_id
+            ).scalar_subquery()
+        )
+    )
     
+    # Serialize before committing so the expired instance isn't reloaded
+    response = GradeResponse.model_validate(grade).model_dump()
     db.commit()
-    db.refresh(grade)
-    
-    # Update submission total score
-    submission = db.query(Submission).filter(Submission.id == grade.submission_id).first()
-    if submission:
-        total_score = sum(g.final_score for g in submission.grades)
-        submission.total_score = total_score
-        db.commit()
     
-    return grade
+    return response
 
 
 @router.get("/assignment/{assignment_id}/export")
 def export_grades(
     assignment_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Export grades for an assignment as CSV data"""
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only instructors and TAs can export grades"
+    # Select only the exported columns instead of hydrating Submission/Grade objects.
+    # Outer join so submissions without grades are still exported.
+    rows = db.execute(
+        select(
+            Submission.id.label("submission_id"),
+            User.name,
+            User.email,
+            Submission.total_score,
+            Grade.question_no,
+            Grade.final_score
         )
-    
-    # Get all submissions for the assignment
-    submissions = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id
+        .select_from(User)
+        .join(Submission, Submission.student_id == User.id)
+        .outerjoin(Grade, Grade.submission_id == Submission.id)
+        .where(Submission.assignment_id == assignment_id)
+        .order_by(Submission.id)
     ).all()
     
     export_data = []
-    for submission in submissions:
-        student_name = submission.student.name
-        student_email = submission.student.email
-        total_score = submission.total_score
+    for _, submission_rows in groupby(rows, key=lambda row: row.submission_id):
+        submission_rows = list(submission_rows)
+        first_row = submission_rows[0]
         
         # Get individual question scores
-        grades = db.query(Grade).filter(Grade.submission_id == submission.id).all()
-        question_scores = {grade.question_no: grade.final_score for grade in grades}
+        question_scores = {
+            row.question_no: row.final_score
+            for row in submission_rows
+            if row.question_no is not None
+        }
         
         export_data.append({
-            "student_name": student_name,
-            "student_email": student_email,
-            "total_score": total_score,
+            "student_name": first_row.name,
+            "student_email": first_row.email,
+            "total_score": first_row.total_score,
             "question_scores": question_scores
         })
     
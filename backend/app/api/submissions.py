@@ -1,20 +1,42 @@
 import os
+import shutil
 import uuid
-from typing import List, Optional
+from typing import BinaryIO, List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from ..core.database import get_db
-from ..core.auth import get_current_user
+from ..core.database import get_db, dialect_insert
+from ..core.auth import Principal, get_current_principal, require_staff
 from ..core.config import settings
 from ..models.user import User, UserRole
 from ..models.assignment import Assignment
 from ..models.submission import Submission, SubmissionStatus
 from ..services.grading_service import trigger_grading
+from ..services.storage import delete_upload, object_exists, presign_upload, s3_enabled, s3_path
 
 router = APIRouter()
 
+# Submission file types students may upload
+ALLOWED_EXTENSIONS = frozenset({".tex", ".txt"})
+
+# Largest page a client may request from an assignment's submission list
+SUBMISSION_PAGE_MAX = 1000
+
+# Columns needed for list entries; file_path and the parsed_json blob are left out
+SUBMISSION_LIST_COLUMNS = (
+    Submission.id,
+    Submission.assignment_id,
+    Submission.student_id,
+    Submission.original_filename,
+    Submission.status,
+    Submission.total_score,
+    Submission.created_at,
+)
+
 
 class StudentInfo(BaseModel):
     id: int
@@ -40,11 +62,114 @@ class SubmissionResponse(BaseModel):
         from_attributes = True
 
 
+class PresignedUploadResponse(BaseModel):
+    url: str
+    fields: dict
+    key: str
+
+
+class CompleteUploadRequest(BaseModel):
+    key: str
+    original_filename: str
+
+
+class SubmissionContentResponse(BaseModel):
+    id: int
+    parsed_json: Optional[dict] = None
+
+
+def _submission_list_item(row) -> SubmissionResponse:
+    """Build a list entry from a projected submission row"""
+    values = dict(row._mapping)
+    values["student"] = StudentInfo(
+        id=values["student_id"],
+        name=values.pop("student_name"),
+        email=values.pop("student_email")
+    )
+    return SubmissionResponse(**values)
+
+
+def _save_upload(source: BinaryIO, file_path: str) -> None:
+    """Copy an uploaded file to disk, inside the kernel when possible"""
+    with open(file_path, "wb", buffering=1 << 20) as destination:
+        # Uploads spooled to disk (SpooledTemporaryFile rolls over past its memory
+        # threshold) are copied with sendfile: no userspace buffers and one syscall
+        # per large range instead of one read+write per chunk
+        if hasattr(os, "sendfile") and getattr(source, "_rolled", False):
+            offset = source.tell()
+            size = os.fstat(source.fileno()).st_size
+            while offset < size:
+                sent = os.sendfile(destination.fileno(), source.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            if offset >= size:
+                return
+            source.seek(offset)
+        
+        shutil.copyfileobj(source, destination, settings.UPLOAD_CHUNK_SIZE)
+
+
+def _submission_insert(assignment_id: int, student_id: int, file_path: str, original_filename: str):
+    """Build the single-statement submission insert"""
+    # The unique (assignment_id, student_id) index rejects a second submission and
+    # the foreign keys reject unknown assignments and students
+    return dialect_insert(Submission).values(
+        assignment_id=assignment_id,
+        student_id=student_id,
+        file_path=file_path,
+        original_filename=original_filename,
+        status=SubmissionStatus.UPLOADED
+    ).on_conflict_do_nothing(
+        index_elements=[Submission.assignment_id, Submission.student_id]
+    ).returning(Submission)
+
+
+def _record_submission(
+    db: Session,
+    stmt,
+    assignment_id: int,
+    file_path: str,
+    discard_upload: bool = True
+) -> SubmissionResponse:
+    """Run the submission insert and serialize the new row, removing the upload on failure"""
+    try:
+        submission = db.scalars(stmt).first()
+    except IntegrityError:
+        db.rollback()
+        if discard_upload:
+            delete_upload(file_path)
+        
+        # A foreign key failed: either the assignment or, for a token whose user has
+        # since been deleted, the student
+        if db.query(Assignment.id).filter(Assignment.id == assignment_id).first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Assignment not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    if submission is None:
+        if discard_upload:
+            delete_upload(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Submission already exists for this assignment"
+        )
+    
+    db.commit()
+    
+    return SubmissionResponse.model_validate(submission)
+
+
 @router.post("/{assignment_id}", response_model=SubmissionResponse)
 async def upload_submission(
     assignment_id: int,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Upload a LaTeX submission for an assignment"""
@@ -54,107 +179,164 @@ async def upload_submission(
             detail="Only students can upload submissions"
         )
     
-    # Check if assignment exists
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
-    if not assignment:
+    # Validate file type
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Assignment not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only .tex and .txt files are allowed"
         )
     
-    # Check if student already has a submission
-    existing_submission = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id,
-        Submission.student_id == current_user.id
-    ).first()
+    # The multipart body is already spooled, so reject oversize uploads before copying
+    if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {settings.MAX_UPLOAD_BYTES} byte upload limit"
+        )
     
-    if existing_submission:
+    # Generate unique filename
+    unique_filename = f"{uuid.uuid4()}{file_extension}"
+    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    
+    # Save file on a worker thread so disk I/O doesn't block the event loop
+    await run_in_threadpool(_save_upload, file.file, file_path)
+    
+    stmt = _submission_insert(assignment_id, current_user.id, file_path, file.filename)
+    
+    # Database and broker calls block, so they run on the threadpool as well
+    response = await run_in_threadpool(_record_submission, db, stmt, assignment_id, file_path)
+    
+    # Trigger async grading
+    await run_in_threadpool(trigger_grading.delay, response.id)
+    
+    return response
+
+
+def _require_s3_student(current_user: Principal) -> None:
+    """Direct uploads need object storage configured and a student caller"""
+    if not s3_enabled():
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Submission already exists for this assignment"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Direct uploads are not enabled"
         )
     
-    # Validate file type
-    if not file.filename.endswith(('.tex', '.txt')):
+    if current_user.role != UserRole.STUDENT:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can upload submissions"
+        )
+
+
+@router.post("/{assignment_id}/presign", response_model=PresignedUploadResponse)
+def presign_submission_upload(
+    assignment_id: int,
+    filename: str,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get a presigned POST for uploading a submission straight to object storage"""
+    _require_s3_student(current_user)
+    
+    file_extension = os.path.splitext(filename)[1].lower()
+    if file_extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only .tex and .txt files are allowed"
         )
     
-    # Create uploads directory if it doesn't exist
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    # Keys are namespaced by student so /complete can't claim someone else's upload
+    key = f"submissions/{current_user.id}/{uuid.uuid4()}{file_extension}"
+    presigned = presign_upload(key)
     
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    return {"url": presigned["url"], "fields": presigned["fields"], "key": key}
+
+
+@router.post("/{assignment_id}/complete", response_model=SubmissionResponse)
+def complete_submission_upload(
+    assignment_id: int,
+    upload: CompleteUploadRequest,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """Record a submission uploaded through a presigned POST and start grading"""
+    _require_s3_student(current_user)
     
-    # Save file
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    if not upload.key.startswith(f"submissions/{current_user.id}/") or not object_exists(upload.key):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload not found"
+        )
     
-    # Create submission record
-    submission = Submission(
-        assignment_id=assignment_id,
-        student_id=current_user.id,
-        file_path=file_path,
-        original_filename=file.filename,
-        status=SubmissionStatus.UPLOADED
-    )
+    # A key can back only one submission; retries and reuse for another assignment are rejected
+    file_path = s3_path(upload.key)
+    if db.query(Submission.id).filter(Submission.file_path == file_path).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload already submitted"
+        )
     
-    db.add(submission)
-    db.commit()
-    db.refresh(submission)
+    # The object is never deleted here: on a conflict it may still belong to a recorded
+    # submission, and unclaimed uploads are expired by the bucket's lifecycle rules
+    stmt = _submission_insert(assignment_id, current_user.id, file_path, upload.original_filename)
+    response = _record_submission(db, stmt, assignment_id, file_path, discard_upload=False)
     
     # Trigger async grading
-    trigger_grading.delay(submission.id)
+    trigger_grading.delay(response.id)
     
-    return submission
+    return response
 
 
 @router.get("/assignment/{assignment_id}", response_model=List[SubmissionResponse])
 def list_submissions(
     assignment_id: int,
-    current_user: User = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=SUBMISSION_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """List submissions for an assignment"""
     # Check if assignment exists
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    assignment = db.query(Assignment.id).filter(Assignment.id == assignment_id).first()
     if not assignment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Assignment not found"
         )
     
+    # Select only the list columns plus the student's name and email; clients fetch
+    # parsed_json per submission from /{submission_id} or /{submission_id}/content
+    query = select(
+        *SUBMISSION_LIST_COLUMNS,
+        User.name.label("student_name"),
+        User.email.label("student_email")
+    ).join(
+        User, Submission.student
+    ).where(
+        Submission.assignment_id == assignment_id
+    )
+    
+    # Students can only see their own submissions; instructors and TAs see all of them
     if current_user.role == UserRole.STUDENT:
-        # Students can only see their own submissions
-        submissions = db.query(Submission).options(
-            joinedload(Submission.student)
-        ).filter(
-            Submission.assignment_id == assignment_id,
-            Submission.student_id == current_user.id
-        ).all()
-    else:
-        # Instructors and TAs can see all submissions
-        submissions = db.query(Submission).options(
-            joinedload(Submission.student)
-        ).filter(
-            Submission.assignment_id == assignment_id
-        ).all()
-    
-    return submissions
+        query = query.where(Submission.student_id == current_user.id)
+    
+    # Every submission unless the client asks for a page
+    rows = db.execute(
+        query.order_by(Submission.id).offset(offset).limit(limit)
+    ).all()
+    
+    return [_submission_list_item(row) for row in rows]
 
 
 @router.get("/{submission_id}", response_model=SubmissionResponse)
 def get_submission(
     submission_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get a specific submission"""
-    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    # Load the student with the submission, since the response includes it
+    submission = db.query(Submission).options(
+        joinedload(Submission.student)
+    ).filter(Submission.id == submission_id).first()
     if not submission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -172,31 +354,52 @@ def get_submission(
     return submission
 
 
-@router.post("/{submission_id}/regrade")
-def trigger_regrade(
+@router.get("/{submission_id}/content", response_model=SubmissionContentResponse)
+def get_submission_content(
     submission_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    """Trigger regrading of a submission"""
-    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    """Get the parsed answers of a submission"""
+    submission = db.query(
+        Submission.id, Submission.student_id, Submission.parsed_json
+    ).filter(Submission.id == submission_id).first()
     if not submission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Submission not found"
         )
     
-    # Only instructors/TAs can trigger regrade
-    if current_user.role not in [UserRole.INSTRUCTOR, UserRole.TA]:
+    # Check permissions
+    if (current_user.role == UserRole.STUDENT and 
+        submission.student_id != current_user.id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only instructors and TAs can trigger regrading"
+            detail="You can only view your own submissions"
+        )
+    
+    return {"id": submission.id, "parsed_json": submission.parsed_json}
+
+
+@router.post("/{submission_id}/regrade")
+def trigger_regrade(
+    submission_id: int,
+    current_user: Principal = Depends(require_staff),
+    db: Session = Depends(get_db)
+):
+    """Trigger regrading of a submission"""
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found"
         )
     
     # Update status and trigger grading
     submission.status = SubmissionStatus.PROCESSING
     db.commit()
     
-    trigger_grading.delay(submission_id)
+    # A regrade asks for a fresh grade, so skip grades cached for identical prompts
+    trigger_grading.delay(submission_id, force_refresh=True)
     
     return {"message": "Regrading triggered successfully"}
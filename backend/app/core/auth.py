@@ -1,20 +1,47 @@
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import NamedTuple, Optional
+import jwt
+from jwt import InvalidTokenError
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from .config import settings
 from .database import get_db
-from ..models.user import User
+from ..models.user import User, UserRole
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing - new hashes use argon2id, existing bcrypt hashes still verify
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=2,
+    argon2__memory_cost=65536,
+    argon2__parallelism=1,
+)
 
 # JWT token scheme
 security = HTTPBearer()
 
+# Roles allowed to manage assignments and grades
+STAFF_ROLES = frozenset({UserRole.INSTRUCTOR, UserRole.TA})
+
+
+class CurrentUser(NamedTuple):
+    """Identity of the authenticated user, without ORM state or relationships"""
+    id: int
+    email: str
+    name: str
+    role: UserRole
+
+
+class Principal(NamedTuple):
+    """Identity carried in the signed token claims, built without a database lookup"""
+    id: int
+    email: str
+    role: UserRole
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -39,8 +66,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify JWT token and extract user info"""
+def verify_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Verify JWT token and return its claims"""
     try:
         payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
@@ -49,28 +76,59 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
-        return email
-    except JWTError:
+        return payload
+    except InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
 
 
-def get_current_user(email: str = Depends(verify_token), db: Session = Depends(get_db)):
-    """Get current user from database"""
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+def verify_token(claims: dict = Depends(verify_token_claims)) -> str:
+    """Verify JWT token and extract user info"""
+    return claims["sub"]
+
+
+def get_current_user(email: str = Depends(verify_token), db: Session = Depends(get_db)) -> CurrentUser:
+    """Get current user from the database"""
+    row = db.execute(
+        select(User.id, User.email, User.name, User.role).where(User.email == email)
+    ).first()
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return user
+    
+    return CurrentUser(*row)
+
+
+def get_current_principal(claims: dict = Depends(verify_token_claims), db: Session = Depends(get_db)) -> Principal:
+    """Get the current user's id, email and role from the token claims"""
+    if "uid" in claims and "role" in claims:
+        return Principal(claims["uid"], claims["sub"], UserRole(claims["role"]))
+    
+    # Tokens minted before uid/role were added to the claims need a lookup
+    user = get_current_user(claims["sub"], db)
+    return Principal(user.id, user.email, user.role)
+
+
+def require_staff(current_user: Principal = Depends(get_current_principal)) -> Principal:
+    """Get current user, requiring an instructor or TA role"""
+    if current_user.role not in STAFF_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only instructors and TAs can perform this action"
+        )
+    return current_user
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    """Authenticate user with email and password"""
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: Session, email: str, password: str):
+    """Authenticate user with email and password, returning a row of the login fields"""
+    # The session is synchronous, so query from a worker thread
+    stmt = select(User.id, User.email, User.name, User.role, User.hashed_password).where(User.email == email)
+    user = await asyncio.to_thread(lambda: db.execute(stmt).first())
+    # Password verification is deliberately slow, so keep it off the event loop
+    if not user or not await asyncio.to_thread(verify_password, password, user.hashed_password):
         return False
     return user
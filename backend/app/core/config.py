@@ -6,9 +6,21 @@ from decouple import config
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = config("DATABASE_URL", default="sqlite:///./autograder.db")
+    DB_POOL_SIZE: int = config("DB_POOL_SIZE", default=20, cast=int)
+    DB_MAX_OVERFLOW: int = config("DB_MAX_OVERFLOW", default=40, cast=int)
+    DB_POOL_RECYCLE: int = config("DB_POOL_RECYCLE", default=1800, cast=int)
     
     # OpenAI
     OPENAI_API_KEY: str = config("OPENAI_API_KEY", default="")
+    # Retries of rate-limited (429) and failed (5xx) API calls, with exponential backoff
+    OPENAI_MAX_RETRIES: int = config("OPENAI_MAX_RETRIES", default=4, cast=int)
+    LLM_MAX_CONCURRENCY: int = config("LLM_MAX_CONCURRENCY", default=8, cast=int)
+    # Questions graded per API call; 1 grades every question with its own call
+    GRADE_BATCH_SIZE: int = config("GRADE_BATCH_SIZE", default=10, cast=int)
+    # Grade through the OpenAI Batch API: half the cost, results within 24 hours
+    USE_BATCH_API: bool = config("USE_BATCH_API", default=False, cast=bool)
+    GRADE_CACHE_TTL: int = config("GRADE_CACHE_TTL", default=7 * 24 * 3600, cast=int)
+    PARSE_CACHE_TTL: int = config("PARSE_CACHE_TTL", default=7 * 24 * 3600, cast=int)
     
     # Redis
     REDIS_URL: str = config("REDIS_URL", default="redis://localhost:6379/0")
@@ -20,6 +32,15 @@ class Settings(BaseSettings):
     
     # File storage
     UPLOAD_DIR: str = config("UPLOAD_DIR", default="./uploads")
+    MAX_UPLOAD_BYTES: int = config("MAX_UPLOAD_BYTES", default=5 * 1024 * 1024, cast=int)
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    # Whole request bodies; room for the three assignment documents plus multipart framing
+    MAX_REQUEST_BYTES: int = config("MAX_REQUEST_BYTES", default=16 * 1024 * 1024, cast=int)
+    
+    # Object storage for direct-to-bucket submission uploads (disabled when unset)
+    S3_BUCKET: str = config("S3_BUCKET", default="")
+    S3_ENDPOINT_URL: str = config("S3_ENDPOINT_URL", default="")
+    S3_PRESIGN_EXPIRES: int = 300
     
     # Environment
     DEBUG: bool = config("DEBUG", default=True, cast=bool)
@@ -1,9 +1,10 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 from .core.config import settings
-from .core.database import engine
+from .core.database import engine, pool_status
 from .models import Base
 from .api import auth, assignments, submissions, grades
 
@@ -14,7 +15,8 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Edison API",
     description="Edison - An AI-assisted educational platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -26,6 +28,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversize bodies from Content-Length before any of the body is read or spooled
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_REQUEST_BYTES:
+        return ORJSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"Request body exceeds the {settings.MAX_REQUEST_BYTES} byte limit"}
+        )
+    return await call_next(request)
+
 # Create upload directory if it doesn't exist
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
@@ -39,7 +52,7 @@ app.include_router(grades.router, prefix="/api/grades", tags=["Grades"])
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "Edison API is running"}
+    return {"status": "healthy", "message": "Edison API is running", "db_pool": pool_status()}
 
 # Root endpoint
 @app.get("/")
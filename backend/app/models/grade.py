@@ -8,7 +8,7 @@ class Grade(Base):
     __tablename__ = "grades"
 
     id = Column(Integer, primary_key=True, index=True)
-    submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False, index=True)
     question_no = Column(String, nullable=False)  # e.g., "q1", "q2", etc.
     
     # AI-generated scores and feedback
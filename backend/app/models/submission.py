@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -40,3 +40,10 @@ class Submission(Base):
     assignment = relationship("Assignment", back_populates="submissions")
     student = relationship("User", back_populates="submissions")
     grades = relationship("Grade", back_populates="submission")
+
+    # One submission per student per assignment
+    __table_args__ = (
+        Index("ix_submissions_assignment_student", "assignment_id", "student_id", unique=True),
+        # Direct uploads look up whether an object key is already recorded
+        Index("ix_submissions_file_path", "file_path"),
+    )
@@ -1,12 +1,24 @@
+from datetime import datetime
+import orjson
+import redis
 from celery import Celery
+from celery.signals import worker_process_shutdown
+from sqlalchemy import delete, insert
 from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
 from ..core.config import settings
 from ..core.database import SessionLocal
 from ..models.submission import Submission, SubmissionStatus
 from ..models.assignment import Assignment
 from ..models.grade import Grade
 from .latex_parser import parse_latex_submission
-from .llm_service import grade_submission_questions
+from .llm_service import (
+    close_llm_service,
+    collect_grading_batch,
+    grade_submission_questions,
+    submit_grading_batch,
+)
+from .storage import local_copy
 
 # Initialize Celery
 celery_app = Celery(
@@ -28,13 +40,67 @@ celery_app.conf.update(
 )
 
 
+@worker_process_shutdown.connect
+def _close_llm_connections(**kwargs):
+    """Close pooled OpenAI connections when a worker process exits"""
+    close_llm_service()
+
+
+# Rubric/answer key cache shared by grading workers, on the broker's Redis
+assignment_cache = redis.Redis.from_url(settings.REDIS_URL)
+ASSIGNMENT_CACHE_TTL = 3600
+
+# Seconds between checks on a submission's OpenAI grading batch
+BATCH_POLL_INTERVAL = 60
+
+
+def _assignment_cache_key(assignment_id: int, changed_at: Optional[datetime]) -> str:
+    # Keyed by the last change, so an update never serves (or gets overwritten by) an
+    # older copy; superseded entries just expire
+    version = changed_at.timestamp() if changed_at else 0.0
+    return f"assign:{assignment_id}:{version}"
+
+
+def _load_assignment_cached(db: Session, assignment_id: int) -> Optional[Dict[str, Any]]:
+    """Get an assignment's rubric and answer key, from Redis or the database"""
+    stamp = db.query(Assignment.updated_at, Assignment.created_at).filter(
+        Assignment.id == assignment_id
+    ).first()
+    if stamp is None:
+        return None
+    
+    try:
+        cached = assignment_cache.get(_assignment_cache_key(assignment_id, stamp.updated_at or stamp.created_at))
+        if cached is not None:
+            return orjson.loads(cached)
+    except redis.RedisError:
+        cached = None
+    
+    # Re-read the version with the data, in case the assignment changed in between
+    row = db.query(
+        Assignment.rubric_json, Assignment.answer_key_json,
+        Assignment.updated_at, Assignment.created_at
+    ).filter(Assignment.id == assignment_id).first()
+    if row is None:
+        return None
+    
+    data = {"rubric": row.rubric_json or {}, "answer_key": row.answer_key_json or {}}
+    try:
+        key = _assignment_cache_key(assignment_id, row.updated_at or row.created_at)
+        assignment_cache.setex(key, ASSIGNMENT_CACHE_TTL, orjson.dumps(data))
+    except redis.RedisError:
+        pass
+    return data
+
+
 @celery_app.task(bind=True)
-def trigger_grading(self, submission_id: int):
+def trigger_grading(self, submission_id: int, force_refresh: bool = False):
     """
     Celery task to grade a submission asynchronously
     
     Args:
         submission_id: ID of the submission to grade
+        force_refresh: Grade with fresh API calls instead of cached grades, for regrades
     """
     db = SessionLocal()
     
@@ -55,7 +121,8 @@ def trigger_grading(self, submission_id: int):
         
         # Parse LaTeX file
         try:
-            parsed_questions = parse_latex_submission(submission.file_path)
+            with local_copy(submission.file_path) as file_path:
+                parsed_questions = parse_latex_submission(file_path)
             submission.parsed_json = parsed_questions
             db.commit()
         except Exception as e:
@@ -65,19 +132,39 @@ def trigger_grading(self, submission_id: int):
         
         self.update_state(state='PROGRESS', meta={'current': 40, 'total': 100, 'status': 'Loading assignment data'})
         
-        # Get assignment and rubric
-        assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
+        # Get assignment rubric and answer key
+        assignment = _load_assignment_cached(db, submission.assignment_id)
         if not assignment:
             raise Exception(f"Assignment {submission.assignment_id} not found")
         
         self.update_state(state='PROGRESS', meta={'current': 60, 'total': 100, 'status': 'Grading with AI'})
         
+        # Grade through the Batch API; collect_batch_grades saves the grades once it's done
+        if settings.USE_BATCH_API:
+            try:
+                batch_id = submit_grading_batch(
+                    questions_answers=parsed_questions,
+                    answer_key=assignment["answer_key"],
+                    rubric=assignment["rubric"]
+                )
+            except Exception as e:
+                submission.status = SubmissionStatus.ERROR
+                db.commit()
+                raise Exception(f"AI grading failed: {str(e)}")
+            
+            if batch_id is not None:
+                collect_batch_grades.apply_async(
+                    (submission_id, batch_id, force_refresh), countdown=BATCH_POLL_INTERVAL
+                )
+                return {'submission_id': submission_id, 'batch_id': batch_id}
+        
         # Grade using LLM
         try:
             grading_results = grade_submission_questions(
                 questions_answers=parsed_questions,
-                answer_key=assignment.answer_key_json,
-                rubric=assignment.rubric_json
+                answer_key=assignment["answer_key"],
+                rubric=assignment["rubric"],
+                force_refresh=force_refresh
             )
         except Exception as e:
             submission.status = SubmissionStatus.ERROR
@@ -86,30 +173,7 @@ def trigger_grading(self, submission_id: int):
         
         self.update_state(state='PROGRESS', meta={'current': 80, 'total': 100, 'status': 'Saving grades'})
         
-        # Save grades to database
-        total_score = 0
-        
-        # Clear existing grades for this submission
-        db.query(Grade).filter(Grade.submission_id == submission_id).delete()
-        
-        for question_id, result in grading_results.items():
-            grade = Grade(
-                submission_id=submission_id,
-                question_no=question_id,
-                ai_score=result.score,
-                ai_feedback=result.feedback,
-                ai_satisfies_rubric=result.satisfies_rubric,
-                final_score=result.score,  # Initially same as AI score
-                final_feedback=result.feedback,  # Initially same as AI feedback
-                human_reviewed=False
-            )
-            db.add(grade)
-            total_score += result.score
-        
-        # Update submission
-        submission.total_score = total_score
-        submission.status = SubmissionStatus.GRADED
-        db.commit()
+        total_score = _save_grades(db, submission, grading_results)
         
         self.update_state(state='SUCCESS', meta={'current': 100, 'total': 100, 'status': 'Grading completed'})
         
@@ -136,6 +200,86 @@ def trigger_grading(self, submission_id: int):
         db.close()
 
 
+def _save_grades(db: Session, submission: Submission, grading_results: Dict[str, Any]) -> int:
+    """Replace a submission's grades with new AI grades and mark it graded, returning the total score"""
+    rows = [
+        {
+            "submission_id": submission.id,
+            "question_no": question_id,
+            "ai_score": result.score,
+            "ai_feedback": result.feedback,
+            "ai_satisfies_rubric": result.satisfies_rubric,
+            "final_score": result.score,  # Initially same as AI score
+            "final_feedback": result.feedback,  # Initially same as AI feedback
+            "human_reviewed": False,
+        }
+        for question_id, result in grading_results.items()
+    ]
+    total_score = sum(row["ai_score"] for row in rows)
+    
+    # Replace existing grades for this submission: one DELETE and one multi-row
+    # INSERT, committed together with the submission update below
+    db.execute(delete(Grade).where(Grade.submission_id == submission.id))
+    if rows:
+        db.execute(insert(Grade), rows)
+    
+    # Update submission
+    submission.total_score = total_score
+    submission.status = SubmissionStatus.GRADED
+    db.commit()
+    
+    return total_score
+
+
+@celery_app.task(bind=True, max_retries=None)
+def collect_batch_grades(self, submission_id: int, batch_id: str, force_refresh: bool = False):
+    """
+    Celery task polling an OpenAI grading batch, saving the grades once it completes
+    
+    Args:
+        submission_id: ID of the submission being graded
+        batch_id: Batch returned by submit_grading_batch
+        force_refresh: Grade questions the batch failed on without cached grades
+    """
+    db = SessionLocal()
+    
+    try:
+        submission = db.query(Submission).filter(Submission.id == submission_id).first()
+        if not submission:
+            raise Exception(f"Submission {submission_id} not found")
+        
+        assignment = _load_assignment_cached(db, submission.assignment_id)
+        if not assignment:
+            raise Exception(f"Assignment {submission.assignment_id} not found")
+        
+        try:
+            grading_results = collect_grading_batch(
+                batch_id,
+                questions_answers=submission.parsed_json,
+                answer_key=assignment["answer_key"],
+                rubric=assignment["rubric"],
+                force_refresh=force_refresh
+            )
+        except Exception as e:
+            submission.status = SubmissionStatus.ERROR
+            db.commit()
+            raise Exception(f"AI grading failed: {str(e)}")
+        
+        if grading_results is None:
+            raise self.retry(countdown=BATCH_POLL_INTERVAL)
+        
+        total_score = _save_grades(db, submission, grading_results)
+        
+        return {
+            'submission_id': submission_id,
+            'total_score': total_score,
+            'questions_graded': len(grading_results)
+        }
+    
+    finally:
+        db.close()
+
+
 @celery_app.task
 def cleanup_old_tasks():
     """Periodic task to clean up old Celery task results"""
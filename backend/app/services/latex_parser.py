@@ -1,14 +1,104 @@
+import mmap
+import os
 import re
-from typing import Dict, List, Optional
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, Optional, Tuple
 from pylatexenc.latex2text import LatexNodes2Text
+from pylatexenc.latexwalker import LatexWalkerError
+
+# Preamble lines and document environment tags removed by _clean_latex_content,
+# fused into one alternation so the source is scanned and copied once
+_PREAMBLE_RE = re.compile(
+    r'\\(?:documentclass|usepackage|title|author|date|maketitle)[^\n]*\n'
+    r'|\\(?:begin|end)\{document\}'
+)
+
+# Matches: \section{Q1}, \section{Q1.1}, \section{Question 1}, \section{Problem 1.2}, etc.
+_SECTION_RE = re.compile(r'\\section\{(?:Q|Question|Problem)\s*(\d+(?:\.\d+)?)[^}]*\}', re.IGNORECASE)
+
+# Submission files at least this large are memory-mapped rather than read
+MMAP_THRESHOLD_BYTES = 64 * 1024
+
+# Same pattern for locating sections directly in the mapped file bytes
+_SECTION_BYTES_RE = re.compile(_SECTION_RE.pattern.encode(), re.IGNORECASE)
+
+# Start of a preamble line _PREAMBLE_RE removes through to the end of the line
+_PREAMBLE_LINE_BYTES_RE = re.compile(rb'\\(?:documentclass|usepackage|title|author|date|maketitle)')
+
+# Subsection markers tried in order within a question
+_SUBSECTION_RES = [
+    re.compile(r'\n\s*\(([a-z])\)\s*', re.IGNORECASE),  # (a), (b), (c)
+    re.compile(r'\n\s*([a-z])\)\s*', re.IGNORECASE),    # a), b), c)
+    re.compile(r'\n\s*([a-z])\.\s*', re.IGNORECASE),    # a., b., c.
+    re.compile(r'\n\s*(\d+)\.\s*', re.IGNORECASE),      # 1., 2., 3.
+    re.compile(r'\n\s*\((\d+)\)\s*', re.IGNORECASE),    # (1), (2), (3)
+]
+
+# Any subsection marker at all. A family with two matches always gives this at least
+# two, so fewer rules out every family in one scan. It can't replace the per-family
+# scans: one family's trailing whitespace can swallow the newline another starts with.
+_ANY_SUBSECTION_RE = re.compile(
+    '|'.join(f'(?:{pattern.pattern})' for pattern in _SUBSECTION_RES), re.IGNORECASE
+)
+
+# Question headers tried in order when there are no \section headers
+_FALLBACK_QUESTION_RES = [
+    re.compile(r'\n\s*(\d+)\.\s*', re.IGNORECASE),  # "1. "
+    re.compile(r'\n\s*Q(\d+):?\s*', re.IGNORECASE),  # "Q1:" or "Q1 "
+    re.compile(r'\n\s*Question\s+(\d+):?\s*', re.IGNORECASE),  # "Question 1:"
+    re.compile(r'\n\s*Problem\s+(\d+):?\s*', re.IGNORECASE),  # "Problem 1:"
+]
+
+# Any fallback question header. Some family matches iff this does, so one search settles
+# the header-less case; the families still run in order since the first with matches wins.
+_ANY_FALLBACK_QUESTION_RE = re.compile(
+    '|'.join(f'(?:{pattern.pattern})' for pattern in _FALLBACK_QUESTION_RES), re.IGNORECASE
+)
+
+# Anything pylatexenc would rewrite: special characters, dashes, TeX quotes and the
+# !` ?` ligatures. Text without any of these converts to itself, so the node walk can
+# be skipped (tests/test_latex_fast_path.py checks this against pylatexenc).
+_LATEX_MARKUP_RE = re.compile(r"[\\$%{}~^_&#]|--|``|''|[!?]`")
+
+# Answers at least this long are converted by Pandoc, when it's installed, since the
+# pylatexenc node walk is pure Python and dominates parsing time for large sections
+PANDOC_THRESHOLD_CHARS = 50_000
+
+# One converter for every parser; conversions are cached since the same answer text
+# is converted again whenever a submission or document is re-parsed
+_LATEX_CONVERTER = LatexNodes2Text()
+
+_MULTI_NEWLINE_RE = re.compile(r'\n\s*\n')
+# Only runs of two or more; rewriting every single space with itself is most of the cost
+_SPACES_RE = re.compile(r' {2,}')
+
+
+@lru_cache(maxsize=1)
+def _pandoc_available() -> bool:
+    """Whether pypandoc and the pandoc binary it drives are installed"""
+    try:
+        import pypandoc
+        pypandoc.get_pandoc_version()
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+@lru_cache(maxsize=512)
+def _convert_latex(latex: str) -> str:
+    """Convert LaTeX to plain text, with Pandoc for large inputs and pylatexenc otherwise"""
+    # Spawning pandoc costs more than the node walk saves on small inputs
+    if len(latex) >= PANDOC_THRESHOLD_CHARS and _pandoc_available():
+        import pypandoc
+        return pypandoc.convert_text(latex, 'plain', format='latex', extra_args=['--wrap=none'])
+    
+    return _LATEX_CONVERTER.latex_to_text(latex)
 
 
 class LatexParser:
     """Service to parse LaTeX files and extract question-answer pairs"""
     
-    def __init__(self):
-        self.latex_converter = LatexNodes2Text()
-    
     def parse_latex_file(self, file_path: str) -> Dict[str, str]:
         """
         Parse a LaTeX file and extract questions/answers
@@ -21,45 +111,68 @@ class LatexParser:
         Answer content...
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            return self._extract_questions(content)
+            with open(file_path, 'rb') as f:
+                # Small files (and empty ones, which mmap can't map) are cheaper to read
+                if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD_BYTES:
+                    return self._extract_questions(self._decode(f.read()))
+                
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return self._extract_questions_from_buffer(mapped)
         except Exception as e:
             raise Exception(f"Error parsing LaTeX file: {str(e)}")
     
+    def _extract_questions_from_buffer(self, buffer: mmap.mmap) -> Dict[str, str]:
+        """Extract questions from mapped file bytes, decoding only each section's slice"""
+        # The text path strips preamble lines before looking for sections, so a header
+        # on one of those lines (e.g. inside \title{...}) isn't a section there either
+        sections = [
+            match for match in _SECTION_BYTES_RE.finditer(buffer)
+            if not self._on_preamble_line(buffer, match)
+        ]
+        
+        if not sections:
+            # No section headers, so the fallback patterns need the whole document
+            return self._extract_questions(self._decode(buffer[:]))
+        
+        def section_answers():
+            for i, match in enumerate(sections):
+                end_pos = sections[i + 1].start() if i + 1 < len(sections) else len(buffer)
+                answer_latex = self._clean_latex_content(self._decode(buffer[match.end():end_pos]))
+                yield match.group(1).decode('ascii'), answer_latex
+        
+        return self._questions_from_sections(section_answers())
+    
     def _extract_questions(self, latex_content: str) -> Dict[str, str]:
         """Extract questions from LaTeX content using section patterns"""
         
         # Clean up the content first
         content = self._clean_latex_content(latex_content)
         
-        # Enhanced pattern to match various question formats
-        # Matches: \section{Q1}, \section{Q1.1}, \section{Question 1}, \section{Problem 1.2}, etc.
-        section_pattern = r'\\section\{(?:Q|Question|Problem)\s*(\d+(?:\.\d+)?)[^}]*\}'
-        
         # Find all section matches
-        sections = list(re.finditer(section_pattern, content, re.IGNORECASE))
+        sections = list(_SECTION_RE.finditer(content))
         
         if not sections:
             # Fallback: try to split by common question patterns
             return self._fallback_question_extraction(content)
         
+        def section_answers():
+            for i, match in enumerate(sections):
+                # Find the end position (start of next section or end of document)
+                if i + 1 < len(sections):
+                    end_pos = sections[i + 1].start()
+                else:
+                    end_pos = len(content)
+                
+                # Extract the answer content
+                yield match.group(1), content[match.end():end_pos].strip()
+        
+        return self._questions_from_sections(section_answers())
+    
+    def _questions_from_sections(self, section_answers: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """Build the question map from (question number, answer LaTeX) pairs"""
         questions = {}
         
-        for i, match in enumerate(sections):
-            question_num = match.group(1)
-            start_pos = match.end()
-            
-            # Find the end position (start of next section or end of document)
-            if i + 1 < len(sections):
-                end_pos = sections[i + 1].start()
-            else:
-                end_pos = len(content)
-            
-            # Extract the answer content
-            answer_latex = content[start_pos:end_pos].strip()
-            
+        for question_num, answer_latex in section_answers:
             # Check for subsections within this section (like 1.1, 1.2, etc.)
             subsection_content = self._extract_subsections(answer_latex)
             
@@ -70,31 +183,35 @@ class LatexParser:
                     questions[full_question_id] = subsection_text
             else:
                 # Convert LaTeX to plain text for the entire section
-                try:
-                    answer_text = self.latex_converter.latex_to_text(answer_latex)
-                    answer_text = self._clean_text(answer_text)
-                except:
-                    # If conversion fails, use the raw LaTeX
-                    answer_text = answer_latex
-                
-                questions[f"q{question_num}"] = answer_text
+                questions[f"q{question_num}"] = self._latex_to_text(answer_latex)
         
         return questions
     
+    @staticmethod
+    def _on_preamble_line(buffer: bytes, match: re.Match) -> bool:
+        """Whether _clean_latex_content would remove the start of a matched section header"""
+        # Decoding turns a lone \r into a newline too
+        line_start = max(buffer.rfind(b'\n', 0, match.start()), buffer.rfind(b'\r', 0, match.start())) + 1
+        if not _PREAMBLE_LINE_BYTES_RE.search(buffer, line_start, match.start()):
+            return False
+        
+        # A preamble line is only removed along with its line break
+        return buffer.find(b'\n', match.start()) != -1 or buffer.find(b'\r', match.start()) != -1
+    
+    @staticmethod
+    def _decode(raw: bytes) -> str:
+        """Decode file bytes the way text-mode open() would, normalizing newlines"""
+        return raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    
     def _extract_subsections(self, content: str) -> Optional[Dict[str, str]]:
         """Extract subsections like (a), (b), 1.1, 1.2, etc. from content"""
         
-        # Patterns to match subsections
-        subsection_patterns = [
-            r'\n\s*\(([a-z])\)\s*',  # (a), (b), (c)
-            r'\n\s*([a-z])\)\s*',    # a), b), c)
-            r'\n\s*([a-z])\.\s*',    # a., b., c.
-            r'\n\s*(\d+)\.\s*',      # 1., 2., 3.
-            r'\n\s*\((\d+)\)\s*',    # (1), (2), (3)
-        ]
+        # Most answers have no subsections; settle that with one scan instead of five
+        if len(list(islice(_ANY_SUBSECTION_RE.finditer(content), 2))) < 2:
+            return None
         
-        for pattern in subsection_patterns:
-            matches = list(re.finditer(pattern, content, re.IGNORECASE))
+        for pattern in _SUBSECTION_RES:
+            matches = list(pattern.finditer(content))
             if len(matches) >= 2:  # Need at least 2 subsections to consider it valid
                 subsections = {}
                 
@@ -111,14 +228,8 @@ class LatexParser:
                     # Extract subsection content
                     subsection_content = content[start_pos:end_pos].strip()
                     
-                    try:
-                        # Convert LaTeX to plain text
-                        subsection_text = self.latex_converter.latex_to_text(subsection_content)
-                        subsection_text = self._clean_text(subsection_text)
-                    except:
-                        subsection_text = subsection_content
-                    
-                    subsections[subsection_id] = subsection_text
+                    # Convert LaTeX to plain text
+                    subsections[subsection_id] = self._latex_to_text(subsection_content)
                 
                 return subsections
         
@@ -127,16 +238,13 @@ class LatexParser:
     def _fallback_question_extraction(self, content: str) -> Dict[str, str]:
         """Fallback method when section headers are not found"""
         
-        # Try to find question patterns like "1.", "Q1:", "Question 1:", etc.
-        question_patterns = [
-            r'\n\s*(\d+)\.\s*',  # "1. "
-            r'\n\s*Q(\d+):?\s*',  # "Q1:" or "Q1 "
-            r'\n\s*Question\s+(\d+):?\s*',  # "Question 1:"
-            r'\n\s*Problem\s+(\d+):?\s*',  # "Problem 1:"
-        ]
+        # A document with no question headers at all is one answer; settle that in one scan
+        if not _ANY_FALLBACK_QUESTION_RE.search(content):
+            return {"q1": self._latex_to_text(content)}
         
-        for pattern in question_patterns:
-            matches = list(re.finditer(pattern, content, re.IGNORECASE))
+        # Try to find question patterns like "1.", "Q1:", "Question 1:", etc.
+        for pattern in _FALLBACK_QUESTION_RES:
+            matches = list(pattern.finditer(content))
             if matches:
                 questions = {}
                 
@@ -153,47 +261,36 @@ class LatexParser:
                     # Extract answer content
                     answer_latex = content[start_pos:end_pos].strip()
                     
-                    try:
-                        answer_text = self.latex_converter.latex_to_text(answer_latex)
-                        answer_text = self._clean_text(answer_text)
-                    except:
-                        answer_text = answer_latex
-                    
-                    questions[f"q{question_num}"] = answer_text
+                    questions[f"q{question_num}"] = self._latex_to_text(answer_latex)
                 
                 return questions
         
         # If no patterns found, return the entire content as one answer
+        return {"q1": self._latex_to_text(content)}
+    
+    def _latex_to_text(self, latex: str) -> str:
+        """Convert LaTeX to cleaned plain text, falling back to the raw LaTeX"""
+        # Plain prose has nothing to convert, so don't build a pylatexenc node tree for it
+        if not _LATEX_MARKUP_RE.search(latex):
+            return self._clean_text(latex)
+        
         try:
-            clean_content = self.latex_converter.latex_to_text(content)
-            clean_content = self._clean_text(clean_content)
-        except:
-            clean_content = content
-            
-        return {"q1": clean_content}
+            return self._clean_text(_convert_latex(latex))
+        except (LatexWalkerError, ValueError, RuntimeError, OSError):
+            # If conversion fails (pylatexenc, or pandoc for large answers), use the raw LaTeX
+            return latex
     
     def _clean_latex_content(self, content: str) -> str:
         """Clean LaTeX content by removing common preamble and document structure"""
         
-        # Remove document class and preamble
-        content = re.sub(r'\\documentclass.*?\n', '', content)
-        content = re.sub(r'\\usepackage.*?\n', '', content, flags=re.MULTILINE)
-        content = re.sub(r'\\title.*?\n', '', content)
-        content = re.sub(r'\\author.*?\n', '', content)
-        content = re.sub(r'\\date.*?\n', '', content)
-        content = re.sub(r'\\maketitle.*?\n', '', content)
-        
-        # Remove document environment tags
-        content = re.sub(r'\\begin\{document\}', '', content)
-        content = re.sub(r'\\end\{document\}', '', content)
-        
-        return content.strip()
+        # Remove document class, preamble and document environment tags
+        return _PREAMBLE_RE.sub('', content).strip()
     
     def _clean_text(self, text: str) -> str:
         """Clean converted text"""
         # Remove excessive whitespace
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # Multiple newlines to double
-        text = re.sub(r' +', ' ', text)  # Multiple spaces to single
+        text = _MULTI_NEWLINE_RE.sub('\n\n', text)  # Multiple newlines to double
+        text = _SPACES_RE.sub(' ', text)  # Multiple spaces to single
         
         return text.strip()
 
@@ -211,3 +308,4 @@ def parse_latex_submission(file_path: str) -> Dict[str, str]:
     """
     parser = LatexParser()
     return parser.parse_latex_file(file_path)
+
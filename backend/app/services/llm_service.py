@@ -1,10 +1,20 @@
-import json
-from openai import OpenAI
-from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, ValidationError
+import asyncio
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import httpx
+import orjson
+import redis
+import redis.asyncio
+from typing import AbstractSet, Dict, Any, Optional, List, Tuple
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from ..core.config import settings
 
 
+# LLM output is validated (see _GRADING_ADAPTER); results built from fields that are
+# already known-good skip validation with model_construct
 class GradingResult(BaseModel):
     score: int
     feedback: str
@@ -12,6 +22,20 @@ class GradingResult(BaseModel):
     satisfies_rubric: Optional[bool] = False
 
 
+_GRADING_ADAPTER = TypeAdapter(GradingResult)
+
+
+class BatchGradingItem(GradingResult):
+    qid: str
+
+
+class BatchGradingResult(BaseModel):
+    results: List[BatchGradingItem]
+
+
+_BATCH_GRADING_ADAPTER = TypeAdapter(BatchGradingResult)
+
+
 class QuestionPart(BaseModel):
     id: str  # e.g., "1a", "2b", etc.
     question_text: str
@@ -22,7 +46,7 @@ class QuestionPart(BaseModel):
 
 class ParsedQuestion(BaseModel):
     id: str  # e.g., "1", "2", etc.
-    question_text: str
+    question_text: str = ""
     answer_text: Optional[str] = ""
     rubric_text: Optional[str] = ""
     max_points: Optional[int] = 10
@@ -37,6 +61,241 @@ class DocumentParseResult(BaseModel):
         from_attributes = True
 
 
+class _DocumentParseResponse(BaseModel):
+    """Document parsing response as returned by the LLM, before document_type is attached"""
+    questions: List[ParsedQuestion] = []
+
+
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=30.0)
+
+# Structured output schema for grading, so the API always returns conformant JSON
+GRADING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "grading_result",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "score": {"type": "integer"},
+                "feedback": {"type": "string"},
+                "reasoning": {"type": "string"},
+                "satisfies_rubric": {"type": "boolean"}
+            },
+            "required": ["score", "feedback", "reasoning", "satisfies_rubric"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# JSON mode for document parsing: its nested output isn't worth a strict schema, but
+# syntactically valid JSON means retries are only spent on responses that fail validation
+DOCUMENT_RESPONSE_FORMAT = {"type": "json_object"}
+
+# OpenAI Batch API states in which a batch's output isn't available yet
+BATCH_PENDING_STATUSES = frozenset({"validating", "in_progress", "finalizing", "cancelling"})
+
+# Same schema for several questions graded in one call, each result tagged with its qid
+_GRADING_SCHEMA = GRADING_RESPONSE_FORMAT["json_schema"]["schema"]
+BATCH_GRADING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "grading_batch_result",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        **_GRADING_SCHEMA,
+                        "properties": {"qid": {"type": "string"}, **_GRADING_SCHEMA["properties"]},
+                        "required": ["qid", *_GRADING_SCHEMA["required"]]
+                    }
+                }
+            },
+            "required": ["results"],
+            "additionalProperties": False
+        }
+    }
+}
+
+
+# Grading prompt; only the per-question fields are filled in on each call. Fixed text
+# comes first and the student answer last, so prompts for the same question share a
+# long identical prefix that OpenAI's automatic prompt caching bills at a discount.
+_GRADING_PROMPT_TEMPLATE = """
+You are an expert teaching assistant grading student homework. Grade the student answer at the end strictly according to the provided rubric and answer key.
+
+INSTRUCTIONS:
+1. Compare the student answer to the answer key
+2. Apply the grading criteria from the rubric
+3. Provide a score from 0 to the maximum points
+4. FEEDBACK POLICY: 
+   - If the answer earns FULL POINTS (the maximum points) and fully satisfies the rubric, provide NO feedback (empty string)
+   - If the answer is partially correct or incorrect, provide constructive feedback explaining what was missing or wrong
+5. Be consistent and fair in your grading
+6. Focus feedback on specific improvements needed to meet the rubric requirements
+
+IMPORTANT: Respond with ONLY a valid JSON object in this exact format:
+{{
+    "score": <integer from 0 to the maximum points>,
+    "feedback": "<detailed feedback if score is below the maximum points, empty string if it equals them>",
+    "reasoning": "<brief explanation of how you arrived at this score>",
+    "satisfies_rubric": <true if score equals the maximum points, false otherwise>
+}}
+
+Do not include any text before or after the JSON object.
+
+QUESTION:
+{question}
+
+GRADING RUBRIC:
+{rubric_text}
+
+ANSWER KEY:
+{answer_key}
+
+MAXIMUM POINTS: {max_points}
+
+STUDENT ANSWER:
+{student_answer}
+"""
+
+# Prompt for grading several questions in one call; {items} is a JSON array of
+# questions, fixed instructions first as in _GRADING_PROMPT_TEMPLATE
+_BATCH_GRADING_PROMPT_TEMPLATE = """
+You are an expert teaching assistant grading student homework. Grade each of the student answers below strictly according to its own rubric and answer key.
+
+INSTRUCTIONS:
+1. Grade every question independently; one answer must never affect another's grade
+2. Compare each student answer to its answer key
+3. Apply the grading criteria from its rubric
+4. Provide a score from 0 to its max_points
+5. FEEDBACK POLICY: 
+   - If an answer earns FULL POINTS (its max_points) and fully satisfies its rubric, provide NO feedback (empty string)
+   - If an answer is partially correct or incorrect, provide constructive feedback explaining what was missing or wrong
+6. Be consistent and fair in your grading
+7. Focus feedback on specific improvements needed to meet the rubric requirements
+
+Respond with a JSON object whose "results" array has exactly one entry per question, each with its qid, score, feedback, reasoning (a brief explanation of how you arrived at the score) and satisfies_rubric (true only if the score is its max_points).
+
+QUESTIONS (each has a qid, the question, the grading rubric, the answer key, the maximum points and the student answer):
+{items}
+"""
+
+
+# Parsing prompt around the document content, built once per document type:
+# (what the document is, which field the LLM should focus on)
+_PARSING_DOCUMENT_TYPES = {
+    "assignment": (
+        "You are parsing a homework assignment document. Your task is to extract each question and its parts with their question text. Focus on identifying the problems students need to solve.",
+        "question_text",
+    ),
+    "answer_key": (
+        "You are parsing an answer key document. Your task is to extract each question/part with its corresponding answer, solution, or explanation. Focus on the provided solutions.",
+        "answer_text",
+    ),
+    "rubric": (
+        "You are parsing a grading rubric document. Your task is to extract each question/part with its grading criteria, point values, and evaluation guidelines.",
+        "rubric_text",
+    ),
+}
+_DEFAULT_PARSING_DOCUMENT_TYPE = (
+    "You are parsing an academic document. Extract each question and its parts.",
+    "question_text",
+)
+
+_PARSING_PROMPT_TAIL = """
+
+PARSING INSTRUCTIONS:
+1. Carefully read through the entire document
+2. Identify all questions using patterns like:
+   - \\section{{Question 1}}, \\section{{Q1}}, \\section{{Problem 1}}
+   - "Question 1:", "Problem 2:", "Q3."
+   - Numbered items like "1.", "2.", etc.
+3. For each question, identify subparts using patterns like:
+   - \\item[(a)], \\item[(b)] in LaTeX
+   - "(a)", "(b)", "a)", "b)" in plain text
+   - "1.1", "1.2", "2.1", "2.2" style numbering
+4. Extract the complete text content for each question and part
+5. For point values:
+   - Look for explicit point values like "(10 points)", "10 pts", etc.
+   - If not specified, use reasonable defaults (10 points for questions, 5 for parts)
+6. Clean up LaTeX formatting but preserve mathematical expressions
+7. Handle nested structures properly (questions with multiple parts)
+
+CONTENT FOCUS: Pay special attention to extracting the {content_focus} for this document type.
+
+OUTPUT FORMAT: Respond with ONLY a valid JSON object in this exact format:
+{{
+    "questions": [
+        {{
+            "id": "1",
+            "question_text": "Complete question text (empty string if not applicable for this document type)",
+            "answer_text": "Complete answer/solution text (empty string if not applicable for this document type)",
+            "rubric_text": "Complete grading criteria text (empty string if not applicable for this document type)", 
+            "max_points": 20,
+            "parts": [
+                {{
+                    "id": "1a",
+                    "question_text": "Complete subpart question text",
+                    "answer_text": "Complete subpart answer text",
+                    "rubric_text": "Complete subpart grading criteria",
+                    "max_points": 10
+                }},
+                {{
+                    "id": "1b", 
+                    "question_text": "Complete subpart question text",
+                    "answer_text": "Complete subpart answer text",
+                    "rubric_text": "Complete subpart grading criteria",
+                    "max_points": 10
+                }}
+            ]
+        }},
+        {{
+            "id": "2",
+            "question_text": "Second question text",
+            "answer_text": "Second question answer",
+            "rubric_text": "Second question grading criteria",
+            "max_points": 15,
+            "parts": []
+        }}
+    ]
+}}
+
+CRITICAL: 
+- Do not include any text before or after the JSON object
+- Ensure all strings are properly escaped for JSON
+- Include empty strings for fields not applicable to this document type
+- Preserve mathematical notation and formatting within the text fields
+- Be thorough in extracting all content - don't truncate or summarize
+"""
+
+_PARSING_PROMPTS = {
+    document_type: (f"\n{instruction}\n\nDOCUMENT CONTENT:\n", _PARSING_PROMPT_TAIL.format(content_focus=content_focus))
+    for document_type, (instruction, content_focus) in _PARSING_DOCUMENT_TYPES.items()
+}
+_DEFAULT_PARSING_PROMPT = (
+    f"\n{_DEFAULT_PARSING_DOCUMENT_TYPE[0]}\n\nDOCUMENT CONTENT:\n",
+    _PARSING_PROMPT_TAIL.format(content_focus=_DEFAULT_PARSING_DOCUMENT_TYPE[1]),
+)
+
+
+# Patterns for the regex document parser used when no API key is configured
+_MOCK_SECTION_RE = re.compile(r'\\section\{(?:Question\s*|Q|Problem\s*)(\d+)(?:\s*\([^)]*\))?\}', re.IGNORECASE)
+_MOCK_QUESTION_RES = [
+    re.compile(r'\n\s*(\d+)\.?\s+', re.IGNORECASE),  # "1. " or "1 "
+    re.compile(r'\n\s*Question\s+(\d+)', re.IGNORECASE),  # "Question 1"
+    re.compile(r'\n\s*Problem\s+(\d+)', re.IGNORECASE),  # "Problem 1"
+]
+# \item[(a)], \item[a] or a line starting (a) / a); the optional parens cover both item forms
+_MOCK_PART_RE = re.compile(r'\\item\[\(?([a-z])\)?\]|^\s*\(?([a-z])\)\s*', re.MULTILINE | re.IGNORECASE)
+_POINTS_RE = re.compile(r'(\d+)\s*points?', re.IGNORECASE)
+_BEGIN_ENUMERATE_RE = re.compile(r'\\begin\{enumerate\}.*', re.DOTALL)
+_END_ENUMERATE_RE = re.compile(r'\\end\{enumerate\}.*', re.DOTALL)
+
+
 class LLMService:
     """Service for LLM operations including grading and document parsing"""
     
@@ -44,20 +303,50 @@ class LLMService:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY must be set in environment variables")
         
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Imported here since the SDK is slow to import and most importers of this module
+        # (the regex parsers, the API process) may never call the LLM
+        from openai import AsyncOpenAI, OpenAI
+        
+        # Pooled keep-alive connections, shared by concurrent grading calls. The clients
+        # retry 429s and 5xx responses themselves, with exponential backoff and jitter.
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=httpx.Client(limits=OPENAI_HTTP_LIMITS),
+            max_retries=settings.OPENAI_MAX_RETRIES
+        )
+        self.aclient = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(limits=OPENAI_HTTP_LIMITS),
+            max_retries=settings.OPENAI_MAX_RETRIES
+        )
+        # Grading and document parsing results keyed by prompt, shared by all workers
+        # (both connect on first use)
+        self.grade_cache = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+        self.parse_cache = redis.Redis.from_url(settings.REDIS_URL)
         self.model = "gpt-4o-mini"  # Using the cost-effective model
-        self.max_retries = 3
     
-    def grade_question(
+    def close(self) -> None:
+        """Close the sync client's pooled connections and the parse cache connection"""
+        self.client.close()
+        self.parse_cache.close()
+    
+    async def aclose(self) -> None:
+        """Close the async client's pooled connections and the grade cache connection"""
+        await self.aclient.close()
+        await self.grade_cache.aclose()
+    
+    async def grade_question_async(
         self,
         question: str,
         student_answer: str,
         answer_key: str,
         rubric: Dict[str, Any],
-        max_points: int = 10
+        max_points: int = 10,
+        force_refresh: bool = False,
+        rubric_text: Optional[str] = None
     ) -> GradingResult:
         """
-        Grade a single question using the LLM
+        Grade a single question using the LLM, without blocking the event loop
         
         Args:
             question: The question text
@@ -65,6 +354,8 @@ class LLMService:
             answer_key: Expected answer/solution
             rubric: Grading rubric with criteria
             max_points: Maximum points for this question
+            force_refresh: Call the API even if this exact prompt was graded before
+            rubric_text: The rubric already formatted, when grading several answers against it
             
         Returns:
             GradingResult with score and feedback
@@ -72,7 +363,7 @@ class LLMService:
         
         # Check if API key is properly configured
         if settings.OPENAI_API_KEY == "your_openai_api_key_here":
-            return GradingResult(
+            return GradingResult.model_construct(
                 score=0,
                 feedback="OpenAI API key not configured. Please set OPENAI_API_KEY in environment variables.",
                 reasoning="Cannot grade without valid API key",
@@ -81,34 +372,133 @@ class LLMService:
         
         # Construct the grading prompt
         prompt = self._build_grading_prompt(
-            question, student_answer, answer_key, rubric, max_points
+            question, student_answer, answer_key, rubric, max_points, rubric_text
         )
         
-        # Try grading with retries for malformed JSON
-        for attempt in range(self.max_retries):
-            try:
-                response = self._call_openai(prompt)
-                result = self._parse_response(response, max_points)
-                return result
+        # Identical prompts (same answer, answer key and rubric) get identical grades
+        cache_key = self._grade_cache_key(prompt)
+        if not force_refresh:
+            cached = await self._get_cached_grade(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Structured outputs guarantee schema-conformant JSON, so one call is enough
+        try:
+            response = await self._call_openai_async(
+                prompt, response_format=GRADING_RESPONSE_FORMAT, max_tokens=1000
+            )
+            result = self._parse_response(response, max_points)
+        except Exception as e:
+            # ValidationError is the only parsing failure; anything else is an API error
+            if isinstance(e, ValidationError):
+                reasoning = "AI grading failed due to response parsing error."
+            else:
+                reasoning = f"Unexpected error: {str(e)}"
+            return GradingResult.model_construct(
+                score=0,
+                feedback=f"Error in AI grading: {str(e)}. Please review manually.",
+                reasoning=reasoning,
+                satisfies_rubric=False
+            )
+        
+        await self._cache_grade(cache_key, result)
+        return result
+    
+    async def grade_questions_batch_async(
+        self,
+        items: List[Dict[str, Any]],
+        force_refresh: bool = False
+    ) -> Dict[str, GradingResult]:
+        """
+        Grade several questions with a single LLM call
+        
+        Args:
+            items: grade_question_async keyword arguments for each question, plus a
+                unique "qid" identifying it
+            force_refresh: Call the API even for questions graded before
             
-            except (json.JSONDecodeError, ValidationError) as e:
-                if attempt == self.max_retries - 1:
-                    # Last attempt failed, return default response
-                    return GradingResult(
-                        score=0,
-                        feedback=f"Error in AI grading: {str(e)}. Please review manually.",
-                        reasoning="AI grading failed due to response parsing error.",
-                        satisfies_rubric=False
-                    )
+        Returns:
+            Dict of qid -> GradingResult. Questions the response leaves out are missing,
+            so callers can grade them individually; API and parsing errors are raised.
+        """
+        
+        # Each question is cached under its single-question prompt, so grades are shared
+        # with grade_question_async whichever path produced them
+        prompts = {
+            item["qid"]: self._build_grading_prompt(
+                item["question"], item["student_answer"], item["answer_key"],
+                item["rubric"], item["max_points"], item.get("rubric_text")
+            )
+            for item in items
+        }
+        cache_keys = {qid: self._grade_cache_key(prompt) for qid, prompt in prompts.items()}
+        results: Dict[str, GradingResult] = {}
+        if not force_refresh:
+            cached = await asyncio.gather(*(self._get_cached_grade(key) for key in cache_keys.values()))
+            results = {qid: result for qid, result in zip(cache_keys, cached) if result is not None}
+        
+        pending = {item["qid"]: item for item in items if item["qid"] not in results}
+        if not pending:
+            return results
+        
+        batch = [
+            {
+                "qid": qid,
+                "question": item["question"],
+                "rubric": item.get("rubric_text") or self._format_rubric(item["rubric"]),
+                "answer_key": item["answer_key"],
+                "max_points": item["max_points"],
+                "student_answer": item["student_answer"],
+            }
+            for qid, item in pending.items()
+        ]
+        prompt = _BATCH_GRADING_PROMPT_TEMPLATE.format_map({
+            "items": orjson.dumps(batch, option=orjson.OPT_INDENT_2).decode()
+        })
+        response = await self._call_openai_async(
+            prompt,
+            response_format=BATCH_GRADING_RESPONSE_FORMAT,
+            max_tokens=min(1000 * len(batch), 16000)
+        )
+        
+        for graded in _BATCH_GRADING_ADAPTER.validate_json(response).results:
+            item = pending.pop(graded.qid, None)
+            if item is None:
                 continue
             
-            except Exception as e:
-                return GradingResult(
-                    score=0,
-                    feedback=f"Error in AI grading: {str(e)}. Please review manually.",
-                    reasoning=f"Unexpected error: {str(e)}",
-                    satisfies_rubric=False
-                )
+            result = GradingResult.model_construct(
+                score=max(0, min(graded.score, item["max_points"])),
+                feedback=graded.feedback,
+                reasoning=graded.reasoning,
+                satisfies_rubric=graded.satisfies_rubric
+            )
+            await self._cache_grade(cache_keys[graded.qid], result)
+            results[graded.qid] = result
+        
+        return results
+    
+    def _prompt_digest(self, prompt: str) -> str:
+        """Digest identifying a prompt sent to the current model"""
+        return hashlib.blake2b(f"{self.model}|{prompt}".encode(), digest_size=16).hexdigest()
+    
+    def _grade_cache_key(self, prompt: str) -> str:
+        """Content-addressed cache key for a grading prompt"""
+        return f"grade:{self._prompt_digest(prompt)}"
+    
+    async def _get_cached_grade(self, cache_key: str) -> Optional[GradingResult]:
+        """Look up a previous grading result; cache errors and outdated entries just mean a miss"""
+        try:
+            cached = await self.grade_cache.get(cache_key)
+            return GradingResult.model_validate_json(cached) if cached is not None else None
+        except (redis.RedisError, ValidationError):
+            return None
+    
+    async def _cache_grade(self, cache_key: str, result: GradingResult) -> None:
+        """Store a successful grading result"""
+        try:
+            await self.grade_cache.setex(cache_key, settings.GRADE_CACHE_TTL, result.model_dump_json())
+        except redis.RedisError:
+            pass
     
     def _build_grading_prompt(
         self,
@@ -116,50 +506,21 @@ class LLMService:
         student_answer: str,
         answer_key: str,
         rubric: Dict[str, Any],
-        max_points: int
+        max_points: int,
+        rubric_text: Optional[str] = None
     ) -> str:
         """Build the grading prompt for the LLM"""
         
-        rubric_text = self._format_rubric(rubric)
+        if rubric_text is None:
+            rubric_text = self._format_rubric(rubric)
         
-        prompt = f"""
-You are an expert teaching assistant grading student homework. Grade the following student answer strictly according to the provided rubric and answer key.
-
-QUESTION:
-{question}
-
-ANSWER KEY:
-{answer_key}
-
-STUDENT ANSWER:
-{student_answer}
-
-GRADING RUBRIC:
-{rubric_text}
-
-MAXIMUM POINTS: {max_points}
-
-INSTRUCTIONS:
-1. Compare the student answer to the answer key
-2. Apply the grading criteria from the rubric
-3. Provide a score from 0 to {max_points}
-4. FEEDBACK POLICY: 
-   - If the answer earns FULL POINTS ({max_points}/{max_points}) and fully satisfies the rubric, provide NO feedback (empty string)
-   - If the answer is partially correct or incorrect, provide constructive feedback explaining what was missing or wrong
-5. Be consistent and fair in your grading
-6. Focus feedback on specific improvements needed to meet the rubric requirements
-
-IMPORTANT: Respond with ONLY a valid JSON object in this exact format:
-{{
-    "score": <integer from 0 to {max_points}>,
-    "feedback": "<detailed feedback if score < {max_points}, empty string if score = {max_points}>",
-    "reasoning": "<brief explanation of how you arrived at this score>",
-    "satisfies_rubric": <true if score = {max_points}, false otherwise>
-}}
-
-Do not include any text before or after the JSON object.
-"""
-        return prompt
+        return _GRADING_PROMPT_TEMPLATE.format_map({
+            "question": question,
+            "answer_key": answer_key,
+            "student_answer": student_answer,
+            "rubric_text": rubric_text,
+            "max_points": max_points,
+        })
     
     def _format_rubric(self, rubric: Dict[str, Any]) -> str:
         """Format rubric dictionary into readable text"""
@@ -177,68 +538,129 @@ Do not include any text before or after the JSON object.
         
         return "\n".join(rubric_lines)
     
-    def _call_openai(self, prompt: str) -> str:
+    def _chat_request(self, prompt: str, **overrides) -> Dict[str, Any]:
+        """Arguments for a chat completion request"""
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are a helpful teaching assistant that grades student work fairly and consistently. Always respond with valid JSON."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.1,  # Low temperature for consistent parsing
+            "max_tokens": 4000,  # Increased for document parsing
+            "timeout": 60,
+            **overrides
+        }
+    
+    def _openai_error(self, e: Exception) -> Exception:
+        """Map an OpenAI client error to the message surfaced to callers"""
+        if "rate_limit" in str(e).lower():
+            return Exception("OpenAI API rate limit exceeded. Please try again later.")
+        elif "invalid" in str(e).lower():
+            return Exception(f"Invalid OpenAI request: {str(e)}")
+        else:
+            return Exception(f"OpenAI API error: {str(e)}")
+    
+    def _call_openai(self, prompt: str, **overrides) -> str:
         """Make API call to OpenAI"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful teaching assistant that grades student work fairly and consistently. Always respond with valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Low temperature for consistent parsing
-                max_tokens=4000,  # Increased for document parsing
-                timeout=60
-            )
-            
+            response = self.client.chat.completions.create(**self._chat_request(prompt, **overrides))
             return response.choices[0].message.content.strip()
-            
         except Exception as e:
-            if "rate_limit" in str(e).lower():
-                raise Exception("OpenAI API rate limit exceeded. Please try again later.")
-            elif "invalid" in str(e).lower():
-                raise Exception(f"Invalid OpenAI request: {str(e)}")
-            else:
-                raise Exception(f"OpenAI API error: {str(e)}")
+            raise self._openai_error(e)
+    
+    async def _call_openai_async(self, prompt: str, **overrides) -> str:
+        """Make API call to OpenAI with the async client"""
+        try:
+            response = await self.aclient.chat.completions.create(**self._chat_request(prompt, **overrides))
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            raise self._openai_error(e)
     
     def _parse_response(self, response: str, max_points: int) -> GradingResult:
         """Parse and validate the LLM response"""
         
-        # Clean up response (remove markdown code blocks if present)
-        response = response.strip()
-        if response.startswith('```json'):
-            response = response[7:]
-        if response.endswith('```'):
-            response = response[:-3]
-        response = response.strip()
-        
-        # Parse JSON
-        try:
-            data = json.loads(response)
-        except json.JSONDecodeError:
-            raise json.JSONDecodeError("Invalid JSON in LLM response", response, 0)
-        
-        # Validate and create result
-        result = GradingResult(**data)
+        # Parse and validate in one pass; malformed JSON raises ValidationError too
+        result = _GRADING_ADAPTER.validate_json(response)
         
         # Ensure score is within bounds
         result.score = max(0, min(result.score, max_points))
         
         return result
     
-    def parse_document(self, content: str, document_type: str) -> DocumentParseResult:
+    def submit_batch(self, prompts: Dict[str, str], **overrides) -> str:
+        """
+        Submit chat completions to the OpenAI Batch API, at half the cost of real-time calls
+        
+        Args:
+            prompts: Dict of custom_id -> prompt
+            overrides: Chat completion parameters, as for _chat_request
+            
+        Returns:
+            The batch id, to pass to get_batch_results
+        """
+        lines = []
+        for custom_id, prompt in prompts.items():
+            body = self._chat_request(prompt, **overrides)
+            body.pop("timeout")  # a client option, not part of the request body
+            lines.append(orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            }))
+        
+        try:
+            batch_file = self.client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+        except Exception as e:
+            raise self._openai_error(e)
+        return batch.id
+    
+    def get_batch_results(self, batch_id: str) -> Optional[Dict[str, str]]:
+        """
+        Get the responses of a finished batch
+        
+        Returns:
+            Dict of custom_id -> response content for each request that succeeded, or
+            None while the batch is still running
+        """
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in BATCH_PENDING_STATUSES:
+                return None
+            if batch.status != "completed":
+                raise Exception(f"Batch {batch_id} {batch.status}")
+            output = self.client.files.content(batch.output_file_id).content if batch.output_file_id else b""
+        except Exception as e:
+            raise self._openai_error(e)
+        
+        responses = {}
+        for line in output.splitlines():
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                responses[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+        return responses
+    
+    def parse_document(self, content: str, document_type: str, force_refresh: bool = False) -> DocumentParseResult:
         """
         Parse a document (assignment, answer key, or rubric) and extract structured questions
         
         Args:
             content: The document content (LaTeX or plain text)
             document_type: One of "assignment", "answer_key", or "rubric"
+            force_refresh: Call the API even if this exact document was parsed before
             
         Returns:
             DocumentParseResult with structured questions and parts
@@ -252,178 +674,79 @@ Do not include any text before or after the JSON object.
         # Build parsing prompt based on document type
         prompt = self._build_parsing_prompt(content, document_type)
         
-        # Try parsing with retries
-        for attempt in range(self.max_retries):
-            try:
-                response = self._call_openai(prompt)
-                result = self._parse_document_response(response, document_type)
-                return result
-            
-            except (json.JSONDecodeError, ValidationError) as e:
-                if attempt == self.max_retries - 1:
-                    # Last attempt failed, return empty result
-                    return DocumentParseResult(
-                        questions=[],
-                        document_type=document_type
-                    )
-                continue
-            
-            except Exception as e:
-                return DocumentParseResult(
-                    questions=[],
-                    document_type=document_type
-                )
+        # The same documents are parsed again whenever an assignment is re-uploaded
+        cache_key = f"parse:{self._prompt_digest(prompt)}"
+        if not force_refresh:
+            cached = self._get_cached_parse(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Rate limits and server errors are retried with backoff by the client itself
+        # (OPENAI_MAX_RETRIES); a response that doesn't validate leaves the document unparsed
+        try:
+            response = self._call_openai(prompt, response_format=DOCUMENT_RESPONSE_FORMAT)
+            result = self._parse_document_response(response, document_type)
+        except Exception:
+            return DocumentParseResult(
+                questions=[],
+                document_type=document_type
+            )
+        
+        self._cache_parse(cache_key, result)
+        return result
+    
+    def _get_cached_parse(self, cache_key: str) -> Optional[DocumentParseResult]:
+        """Look up a previous document parsing result; cache errors and outdated entries just mean a miss"""
+        try:
+            cached = self.parse_cache.get(cache_key)
+            return DocumentParseResult.model_validate_json(cached) if cached is not None else None
+        except (redis.RedisError, ValidationError):
+            return None
+    
+    def _cache_parse(self, cache_key: str, result: DocumentParseResult) -> None:
+        """Store a successful document parsing result"""
+        try:
+            self.parse_cache.setex(cache_key, settings.PARSE_CACHE_TTL, result.model_dump_json())
+        except redis.RedisError:
+            pass
     
     def _build_parsing_prompt(self, content: str, document_type: str) -> str:
         """Build the parsing prompt for the LLM based on document type"""
-        
-        if document_type == "assignment":
-            instruction = """You are parsing a homework assignment document. Your task is to extract each question and its parts with their question text. Focus on identifying the problems students need to solve."""
-            content_focus = "question_text"
-        elif document_type == "answer_key":
-            instruction = """You are parsing an answer key document. Your task is to extract each question/part with its corresponding answer, solution, or explanation. Focus on the provided solutions."""
-            content_focus = "answer_text"
-        elif document_type == "rubric":
-            instruction = """You are parsing a grading rubric document. Your task is to extract each question/part with its grading criteria, point values, and evaluation guidelines."""
-            content_focus = "rubric_text"
-        else:
-            instruction = """You are parsing an academic document. Extract each question and its parts."""
-            content_focus = "question_text"
-        
-        prompt = f"""
-{instruction}
-
-DOCUMENT CONTENT:
-{content}
-
-PARSING INSTRUCTIONS:
-1. Carefully read through the entire document
-2. Identify all questions using patterns like:
-   - \\section{{Question 1}}, \\section{{Q1}}, \\section{{Problem 1}}
-   - "Question 1:", "Problem 2:", "Q3."
-   - Numbered items like "1.", "2.", etc.
-3. For each question, identify subparts using patterns like:
-   - \\item[(a)], \\item[(b)] in LaTeX
-   - "(a)", "(b)", "a)", "b)" in plain text
-   - "1.1", "1.2", "2.1", "2.2" style numbering
-4. Extract the complete text content for each question and part
-5. For point values:
-   - Look for explicit point values like "(10 points)", "10 pts", etc.
-   - If not specified, use reasonable defaults (10 points for questions, 5 for parts)
-6. Clean up LaTeX formatting but preserve mathematical expressions
-7. Handle nested structures properly (questions with multiple parts)
-
-CONTENT FOCUS: Pay special attention to extracting the {content_focus} for this document type.
-
-OUTPUT FORMAT: Respond with ONLY a valid JSON object in this exact format:
-{{
-    "questions": [
-        {{
-            "id": "1",
-            "question_text": "Complete question text (empty string if not applicable for this document type)",
-            "answer_text": "Complete answer/solution text (empty string if not applicable for this document type)",
-            "rubric_text": "Complete grading criteria text (empty string if not applicable for this document type)", 
-            "max_points": 20,
-            "parts": [
-                {{
-                    "id": "1a",
-                    "question_text": "Complete subpart question text",
-                    "answer_text": "Complete subpart answer text",
-                    "rubric_text": "Complete subpart grading criteria",
-                    "max_points": 10
-                }},
-                {{
-                    "id": "1b", 
-                    "question_text": "Complete subpart question text",
-                    "answer_text": "Complete subpart answer text",
-                    "rubric_text": "Complete subpart grading criteria",
-                    "max_points": 10
-                }}
-            ]
-        }},
-        {{
-            "id": "2",
-            "question_text": "Second question text",
-            "answer_text": "Second question answer",
-            "rubric_text": "Second question grading criteria",
-            "max_points": 15,
-            "parts": []
-        }}
-    ]
-}}
-
-CRITICAL: 
-- Do not include any text before or after the JSON object
-- Ensure all strings are properly escaped for JSON
-- Include empty strings for fields not applicable to this document type
-- Preserve mathematical notation and formatting within the text fields
-- Be thorough in extracting all content - don't truncate or summarize
-"""
-        return prompt
+        # Only the document content varies, so splice it between the prebuilt halves
+        head, tail = _PARSING_PROMPTS.get(document_type, _DEFAULT_PARSING_PROMPT)
+        return head + content + tail
     
     def _parse_document_response(self, response: str, document_type: str) -> DocumentParseResult:
         """Parse and validate the LLM document parsing response"""
         
-        # Clean up response (remove markdown code blocks if present)
-        response = response.strip()
-        if response.startswith('```json'):
-            response = response[7:]
-        if response.endswith('```'):
-            response = response[:-3]
-        response = response.strip()
+        # Document parsing isn't schema-constrained, so tolerate markdown code fences
+        # instead of spending a retry on them
+        response = response.strip().removeprefix('```json').removeprefix('```').removesuffix('```').strip()
         
-        # Parse JSON
-        try:
-            data = json.loads(response)
-        except json.JSONDecodeError:
-            raise json.JSONDecodeError("Invalid JSON in LLM response", response, 0)
-        
-        # Validate and create result
-        questions = []
-        for q_data in data.get("questions", []):
-            parts = []
-            for p_data in q_data.get("parts", []):
-                part = QuestionPart(**p_data)
-                parts.append(part)
-            
-            question = ParsedQuestion(
-                id=q_data["id"],
-                question_text=q_data.get("question_text", ""),
-                answer_text=q_data.get("answer_text", ""),
-                rubric_text=q_data.get("rubric_text", ""),
-                max_points=q_data.get("max_points", 10),
-                parts=parts
-            )
-            questions.append(question)
+        # Parse and validate the nested questions and parts in one pass; malformed JSON
+        # raises ValidationError too
+        parsed = _DocumentParseResponse.model_validate_json(response)
         
         return DocumentParseResult(
-            questions=questions,
+            questions=parsed.questions,
             document_type=document_type
         )
     
     def _create_mock_parse_result(self, content: str, document_type: str) -> DocumentParseResult:
         """Create mock parsing result when OpenAI API is not available"""
         
-        import re
-        
         questions = []
         
         # Look for section patterns like \section{Question 1} or \section{Q1} or \section{Question 1 (30 points)}
-        section_pattern = r'\\section\{(?:Question\s*|Q|Problem\s*)(\d+)(?:\s*\([^)]*\))?\}'
-        sections = list(re.finditer(section_pattern, content, re.IGNORECASE))
+        sections = list(_MOCK_SECTION_RE.finditer(content))
         
         if not sections:
             # Fallback: look for numbered questions
-            question_patterns = [
-                r'\n\s*(\d+)\.?\s+',  # "1. " or "1 "
-                r'\n\s*Question\s+(\d+)',  # "Question 1"
-                r'\n\s*Problem\s+(\d+)',  # "Problem 1"
-            ]
-            
-            for pattern in question_patterns:
-                matches = list(re.finditer(pattern, content, re.IGNORECASE))
-                if matches:
-                    sections = matches
+            for pattern in _MOCK_QUESTION_RES:
+                matches = pattern.finditer(content)
+                first = next(matches, None)
+                if first is not None:
+                    sections = [first, *matches]
                     break
         
         for i, match in enumerate(sections):
@@ -441,13 +764,12 @@ CRITICAL:
             
             # Look for enumerated parts like (a), (b) or \item[(a)]
             parts = []
-            part_pattern = r'\\item\[\(?([a-z])\)?\]|\\item\[([a-z])\]|^\s*\(?([a-z])\)\s*'
-            part_matches = list(re.finditer(part_pattern, question_content, re.MULTILINE | re.IGNORECASE))
+            part_matches = list(_MOCK_PART_RE.finditer(question_content))
             
             if part_matches:
                 for j, part_match in enumerate(part_matches):
                     # Extract part ID from any of the groups
-                    part_id = part_match.group(1) or part_match.group(2) or part_match.group(3)
+                    part_id = part_match.group(1) or part_match.group(2)
                     if not part_id:
                         continue
                         
@@ -461,13 +783,13 @@ CRITICAL:
                     part_content = question_content[part_start:part_end].strip()
                     
                     # Clean up LaTeX formatting but keep math
-                    part_content = re.sub(r'\\end\{enumerate\}.*', '', part_content, flags=re.DOTALL)
+                    part_content = _END_ENUMERATE_RE.sub('', part_content)
                     part_content = part_content.strip()
                     
                     # Extract point values for rubric
                     part_points = 5
                     if document_type == "rubric":
-                        point_match = re.search(r'(\d+)\s*points?', part_content, re.IGNORECASE)
+                        point_match = _POINTS_RE.search(part_content)
                         if point_match:
                             part_points = int(point_match.group(1))
                     
@@ -496,20 +818,21 @@ CRITICAL:
             # Determine main question content based on document type
             main_content = question_content
             if parts and part_matches:
-                # Split at first part to get main content
+                # Split at first part to get main content; partition stops at the first
+                # occurrence instead of splitting the whole question at every one
                 try:
-                    main_content = question_content.split(part_matches[0].group(0))[0].strip()
+                    main_content = question_content.partition(part_matches[0].group(0))[0].strip()
                 except:
                     main_content = question_content
             
             # Clean up main content
-            main_content = re.sub(r'\\begin\{enumerate\}.*', '', main_content, flags=re.DOTALL)
+            main_content = _BEGIN_ENUMERATE_RE.sub('', main_content)
             main_content = main_content.strip()
             
             # Extract point values from rubric text
             max_points = 20 if parts else 10
             if document_type == "rubric":
-                point_match = re.search(r'(\d+)\s*points?', main_content or question_content, re.IGNORECASE)
+                point_match = _POINTS_RE.search(main_content or question_content)
                 if point_match:
                     max_points = int(point_match.group(1))
                 elif parts:
@@ -549,93 +872,282 @@ class LLMGradingService(LLMService):
     pass
 
 
-def _find_matching_key(question_id: str, available_keys: list) -> str:
+# Leading question number of an ID, e.g. "q1" in "q1.1.b"
+_QUESTION_NUMBER_RE = re.compile(r'q(\d+)')
+
+
+@lru_cache(maxsize=1)
+def get_llm_service() -> LLMService:
+    """Shared LLMService, so its HTTP connection pools and TLS sessions are reused"""
+    return LLMService()
+
+
+# The shared service's async clients belong to the loop they first run on, so sync
+# callers drive grading on one long-lived loop per process instead of asyncio.run()
+_grading_loop: Optional[asyncio.AbstractEventLoop] = None
+_grading_loop_lock = threading.Lock()
+
+
+def close_llm_service() -> None:
+    """Close the shared service's connections, e.g. when a worker process shuts down"""
+    global _grading_loop
+    
+    if get_llm_service.cache_info().currsize:
+        service = get_llm_service()
+        service.close()
+        with _grading_loop_lock:
+            # The async connections have to be closed on the loop they were opened on
+            if _grading_loop is not None:
+                _grading_loop.run_until_complete(service.aclose())
+                _grading_loop.close()
+                _grading_loop = None
+        get_llm_service.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def _key_candidates(question_id: str) -> Tuple[str, ...]:
     """
-    Find the best matching key for a question ID
+    Keys a question ID can match, most specific first
+    
+    Every submission to an assignment uses the same question IDs, so candidates are
+    cached across submissions.
     
     Args:
         question_id: The question ID to match (e.g., "q1.1.b")
-        available_keys: List of available keys in answer_key/rubric
         
     Returns:
-        Best matching key or None if no match found
+        The ID itself, its parent IDs (e.g., "q1.1", "q1") and its bare question number
     """
     # Exact match first
-    if question_id in available_keys:
-        return question_id
+    candidates = [question_id]
     
-    # Try to find parent question (e.g., "q1.1.b" -> "q1")
+    # Then parent questions (e.g., "q1.1.b" -> "q1.1" -> "q1")
     parts = question_id.split('.')
-    for i in range(len(parts) - 1, 0, -1):
-        parent_key = '.'.join(parts[:i])
-        if parent_key in available_keys:
-            return parent_key
-    
-    # Try to find by number only (e.g., "q1.1.b" -> "q1")
-    import re
-    match = re.match(r'q(\d+)', question_id)
+    candidates.extend('.'.join(parts[:i]) for i in range(len(parts) - 1, 0, -1))
+    
+    # Then the number only (e.g., "q1.1.b" -> "q1")
+    match = _QUESTION_NUMBER_RE.match(question_id)
     if match:
-        simple_key = f"q{match.group(1)}"
-        if simple_key in available_keys:
-            return simple_key
+        candidates.append(f"q{match.group(1)}")
+    
+    return tuple(candidates)
+
+
+def _find_matching_key(
+    question_id: str,
+    available_keys: AbstractSet[str],
+    candidates: Optional[Tuple[str, ...]] = None
+) -> str:
+    """
+    Find the best matching key for a question ID
+    
+    Args:
+        question_id: The question ID to match (e.g., "q1.1.b")
+        available_keys: Set of available keys in answer_key/rubric
+        candidates: Precomputed _key_candidates(question_id), to share across lookups
+        
+    Returns:
+        Best matching key or None if no match found
+    """
+    for key in candidates or _key_candidates(question_id):
+        if key in available_keys:
+            return key
     
     # If we have only one key and it looks like a parent, use it
     if len(available_keys) == 1:
-        return available_keys[0]
+        return next(iter(available_keys))
     
     return None
 
 
-def grade_submission_questions(
+def _grading_items(
+    grading_service: LLMService,
     questions_answers: Dict[str, str],
     answer_key: Dict[str, str],
     rubric: Dict[str, Dict[str, Any]]
-) -> Dict[str, GradingResult]:
+) -> Tuple[List[Dict[str, Any]], Dict[str, GradingResult]]:
     """
-    Grade all questions in a submission with flexible question ID matching
+    Match each question to its answer key and rubric
     
-    Args:
-        questions_answers: Dict of question_id -> student_answer
-        answer_key: Dict of question_id -> correct_answer
-        rubric: Dict of question_id -> rubric_criteria
-        
     Returns:
-        Dict of question_id -> GradingResult
+        grade_question_async arguments (plus "qid") for the matched questions, and
+        default results for the questions with nothing to grade against
     """
-    grading_service = LLMService()
-    results = {}
+    # Sets, since each question checks several candidate keys for membership
+    answer_keys = frozenset(answer_key)
+    rubric_keys = frozenset(rubric)
+    
+    # Several questions often resolve to the same parent rubric; format each one once
+    rubric_texts: Dict[str, str] = {}
     
-    answer_keys = list(answer_key.keys())
-    rubric_keys = list(rubric.keys())
+    results: Dict[str, GradingResult] = {}
+    items: List[Dict[str, Any]] = []
     
     for question_id, student_answer in questions_answers.items():
-        # Find matching answer key
-        answer_key_match = _find_matching_key(question_id, answer_keys)
-        rubric_key_match = _find_matching_key(question_id, rubric_keys)
+        # Find matching answer key and rubric, walking the ID's prefixes once for both
+        candidates = _key_candidates(question_id)
+        answer_key_match = _find_matching_key(question_id, answer_keys, candidates)
+        rubric_key_match = _find_matching_key(question_id, rubric_keys, candidates)
         
         if answer_key_match and rubric_key_match:
             question_rubric = rubric.get(rubric_key_match, {})
-            max_points = question_rubric.get('max_points', 10)
-            
-            result = grading_service.grade_question(
-                question=f"Question {question_id}",
-                student_answer=student_answer,
-                answer_key=answer_key[answer_key_match],
-                rubric=question_rubric,
-                max_points=max_points
-            )
+            if rubric_key_match not in rubric_texts:
+                rubric_texts[rubric_key_match] = grading_service._format_rubric(question_rubric)
             
-            results[question_id] = result
+            items.append({
+                "qid": question_id,
+                "question": f"Question {question_id}",
+                "student_answer": student_answer,
+                "answer_key": answer_key[answer_key_match],
+                "rubric": question_rubric,
+                "max_points": question_rubric.get('max_points', 10),
+                "rubric_text": rubric_texts[rubric_key_match]
+            })
         else:
             # Create a default grade if no match found
-            results[question_id] = GradingResult(
+            results[question_id] = GradingResult.model_construct(
                 score=0,
                 feedback=f"No matching answer key or rubric found for question {question_id}. Please review manually.",
                 reasoning="Question ID mismatch - unable to grade automatically",
                 satisfies_rubric=False
             )
     
-    return results
+    return items, results
+
+
+async def grade_submission_questions_async(
+    questions_answers: Dict[str, str],
+    answer_key: Dict[str, str],
+    rubric: Dict[str, Dict[str, Any]],
+    force_refresh: bool = False
+) -> Dict[str, GradingResult]:
+    """
+    Grade all questions in a submission concurrently with flexible question ID matching
+    
+    Args:
+        questions_answers: Dict of question_id -> student_answer
+        answer_key: Dict of question_id -> correct_answer
+        rubric: Dict of question_id -> rubric_criteria
+        force_refresh: Grade with fresh API calls instead of cached grades, for regrades
+        
+    Returns:
+        Dict of question_id -> GradingResult
+    """
+    grading_service = get_llm_service()
+    
+    # Grading calls are independent and spend their time waiting on the API, so run
+    # them together, bounded to respect rate limits. Questions are packed several to a
+    # call, which amortizes the instructions and round trip across them.
+    semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    
+    items, results = _grading_items(grading_service, questions_answers, answer_key, rubric)
+    
+    async def grade_one(item: Dict[str, Any]) -> None:
+        async with semaphore:
+            results[item["qid"]] = await grading_service.grade_question_async(
+                question=item["question"],
+                student_answer=item["student_answer"],
+                answer_key=item["answer_key"],
+                rubric=item["rubric"],
+                max_points=item["max_points"],
+                force_refresh=force_refresh,
+                rubric_text=item["rubric_text"]
+            )
+    
+    async def grade_batch(batch: List[Dict[str, Any]]) -> None:
+        # One request for the whole batch; anything it fails to grade is graded on its own
+        if len(batch) > 1 and settings.OPENAI_API_KEY != "your_openai_api_key_here":
+            try:
+                async with semaphore:
+                    results.update(await grading_service.grade_questions_batch_async(batch, force_refresh))
+            except Exception:
+                # Malformed batch response or API error; grade the batch one by one
+                pass
+        
+        await asyncio.gather(*(grade_one(item) for item in batch if item["qid"] not in results))
+    
+    batch_size = max(settings.GRADE_BATCH_SIZE, 1)
+    await asyncio.gather(
+        *(grade_batch(items[i:i + batch_size]) for i in range(0, len(items), batch_size))
+    )
+    
+    return {question_id: results[question_id] for question_id in questions_answers}
+
+
+def grade_submission_questions(
+    questions_answers: Dict[str, str],
+    answer_key: Dict[str, str],
+    rubric: Dict[str, Dict[str, Any]],
+    force_refresh: bool = False
+) -> Dict[str, GradingResult]:
+    """Grade all questions in a submission from synchronous code such as Celery tasks"""
+    global _grading_loop
+    
+    with _grading_loop_lock:
+        if _grading_loop is None:
+            _grading_loop = asyncio.new_event_loop()
+        return _grading_loop.run_until_complete(
+            grade_submission_questions_async(questions_answers, answer_key, rubric, force_refresh)
+        )
+
+
+def submit_grading_batch(
+    questions_answers: Dict[str, str],
+    answer_key: Dict[str, str],
+    rubric: Dict[str, Dict[str, Any]]
+) -> Optional[str]:
+    """
+    Submit a submission's questions for grading through the OpenAI Batch API
+    
+    Returns:
+        The batch id, or None if no question matched an answer key and rubric
+    """
+    grading_service = get_llm_service()
+    items, _ = _grading_items(grading_service, questions_answers, answer_key, rubric)
+    if not items:
+        return None
+    
+    prompts = {
+        item["qid"]: grading_service._build_grading_prompt(
+            item["question"], item["student_answer"], item["answer_key"],
+            item["rubric"], item["max_points"], item["rubric_text"]
+        )
+        for item in items
+    }
+    return grading_service.submit_batch(prompts, response_format=GRADING_RESPONSE_FORMAT, max_tokens=1000)
+
+
+def collect_grading_batch(
+    batch_id: str,
+    questions_answers: Dict[str, str],
+    answer_key: Dict[str, str],
+    rubric: Dict[str, Dict[str, Any]],
+    force_refresh: bool = False
+) -> Optional[Dict[str, GradingResult]]:
+    """
+    Get the grades from a batch started by submit_grading_batch
+    
+    Returns:
+        Dict of question_id -> GradingResult, or None while the batch is still running.
+        Questions whose batch request failed are graded with real-time calls.
+    """
+    grading_service = get_llm_service()
+    responses = grading_service.get_batch_results(batch_id)
+    if responses is None:
+        return None
+    
+    items, results = _grading_items(grading_service, questions_answers, answer_key, rubric)
+    ungraded = {}
+    for item in items:
+        try:
+            results[item["qid"]] = grading_service._parse_response(responses[item["qid"]], item["max_points"])
+        except (KeyError, ValidationError):
+            ungraded[item["qid"]] = item["student_answer"]
+    
+    if ungraded:
+        results.update(grade_submission_questions(ungraded, answer_key, rubric, force_refresh))
+    
+    return {question_id: results[question_id] for question_id in questions_answers}
 
 
 def parse_assignment_documents(
@@ -654,16 +1166,21 @@ def parse_assignment_documents(
     Returns:
         Dict with keys "assignment", "answer_key", "rubric" and DocumentParseResult values
     """
-    llm_service = LLMService()
-    results = {}
-    
-    if assignment_content.strip():
-        results["assignment"] = llm_service.parse_document(assignment_content, "assignment")
-    
-    if answer_key_content.strip():
-        results["answer_key"] = llm_service.parse_document(answer_key_content, "answer_key")
-    
-    if rubric_content.strip():
-        results["rubric"] = llm_service.parse_document(rubric_content, "rubric")
+    llm_service = get_llm_service()
+    documents = [
+        (content, document_type)
+        for content, document_type in (
+            (assignment_content, "assignment"),
+            (answer_key_content, "answer_key"),
+            (rubric_content, "rubric"),
+        )
+        if content.strip()
+    ]
+    if not documents:
+        return {}
     
-    return results
+    # The documents are independent and each parse mostly waits on the API, so
+    # parse them side by side
+    with ThreadPoolExecutor(max_workers=len(documents)) as executor:
+        parsed = executor.map(lambda document: llm_service.parse_document(*document), documents)
+        return {document_type: result for (_, document_type), result in zip(documents, parsed)}
@@ -0,0 +1,82 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator
+from ..core.config import settings
+
+S3_SCHEME = "s3://"
+
+
+def s3_enabled() -> bool:
+    """Whether submissions can be uploaded straight to object storage"""
+    return bool(settings.S3_BUCKET)
+
+
+@lru_cache(maxsize=1)
+def _s3_client():
+    """Create the S3/MinIO client on first use"""
+    import boto3
+
+    return boto3.client("s3", endpoint_url=settings.S3_ENDPOINT_URL or None)
+
+
+def s3_path(key: str) -> str:
+    """Stored file_path for an object in the submissions bucket"""
+    return f"{S3_SCHEME}{settings.S3_BUCKET}/{key}"
+
+
+def _split_s3_path(file_path: str):
+    """Split an s3://bucket/key path into (bucket, key)"""
+    bucket, _, key = file_path[len(S3_SCHEME):].partition("/")
+    return bucket, key
+
+
+def presign_upload(key: str) -> Dict:
+    """Presigned POST letting a client upload one text file of bounded size to key"""
+    return _s3_client().generate_presigned_post(
+        Bucket=settings.S3_BUCKET,
+        Key=key,
+        Conditions=[
+            ["content-length-range", 1, settings.MAX_UPLOAD_BYTES],
+            ["starts-with", "$Content-Type", "text/"],
+        ],
+        ExpiresIn=settings.S3_PRESIGN_EXPIRES,
+    )
+
+
+def object_exists(key: str) -> bool:
+    """Check that a client actually uploaded to key"""
+    from botocore.exceptions import ClientError
+
+    try:
+        _s3_client().head_object(Bucket=settings.S3_BUCKET, Key=key)
+    except ClientError:
+        return False
+    return True
+
+
+def delete_upload(file_path: str) -> None:
+    """Remove a stored submission file, local or in object storage"""
+    if file_path.startswith(S3_SCHEME):
+        bucket, key = _split_s3_path(file_path)
+        _s3_client().delete_object(Bucket=bucket, Key=key)
+    else:
+        os.remove(file_path)
+
+
+@contextmanager
+def local_copy(file_path: str) -> Iterator[str]:
+    """Yield a local path for a stored submission, downloading it to scratch if needed"""
+    if not file_path.startswith(S3_SCHEME):
+        yield file_path
+        return
+
+    bucket, key = _split_s3_path(file_path)
+    scratch = tempfile.NamedTemporaryFile(suffix=os.path.splitext(key)[1], delete=False)
+    try:
+        with scratch:
+            _s3_client().download_fileobj(bucket, key, scratch)
+        yield scratch.name
+    finally:
+        os.remove(scratch.name)
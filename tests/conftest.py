@@ -0,0 +1,16 @@
+import pytest
+
+from documents import read_document
+
+# Shared by every test in the session, so each document is read once
+@pytest.fixture(scope='session')
+def assignment_tex():
+    return read_document('test_assignment.tex')
+
+@pytest.fixture(scope='session')
+def answer_key_tex():
+    return read_document('test_answer_key.tex')
+
+@pytest.fixture(scope='session')
+def rubric_tex():
+    return read_document('test_rubric.tex')
@@ -0,0 +1,9 @@
+from functools import lru_cache
+from pathlib import Path
+
+TEST_DIR = Path(__file__).parent
+
+@lru_cache(maxsize=None)
+def read_document(name):
+    """Contents of one of the test .tex documents, read from disk once per process"""
+    return (TEST_DIR / name).read_text()
@@ -1,25 +1,31 @@
 #!/usr/bin/env python3
 
+import os
 import re
 
-def test_regex_parsing():
-    # Read the test assignment file
-    with open('test_assignment.tex', 'r') as f:
-        content = f.read()
+from documents import read_document
+
+# Per-match and per-question detail; off by default so the script can time the regexes
+DEBUG = os.environ.get('PARSE_DEBUG') == '1'
+
+def test_regex_parsing(assignment_tex):
+    content = assignment_tex
     
     print("Original content length:", len(content))
-    print("First 500 chars:")
-    print(content[:500])
-    print("\n" + "="*50 + "\n")
+    if DEBUG:
+        print("First 500 chars:")
+        print(content[:500])
+        print("\n" + "="*50 + "\n")
     
     # Look for section patterns like \section{Question 1} or \section{Q1}
     section_pattern = r'\\section\{(?:Question\s*|Q|Problem\s*)(\d+)\}'
     sections = list(re.finditer(section_pattern, content, re.IGNORECASE))
     
     print(f"Found {len(sections)} sections with pattern: {section_pattern}")
-    for i, match in enumerate(sections):
-        print(f"Section {i+1}: Question {match.group(1)} at position {match.start()}-{match.end()}")
-        print(f"  Match text: '{match.group(0)}'")
+    if DEBUG:
+        for i, match in enumerate(sections):
+            print(f"Section {i+1}: Question {match.group(1)} at position {match.start()}-{match.end()}")
+            print(f"  Match text: '{match.group(0)}'")
     
     if not sections:
         print("No sections found, trying fallback patterns...")
@@ -34,8 +40,9 @@ def test_regex_parsing():
             matches = list(re.finditer(pattern, content, re.IGNORECASE))
             print(f"Pattern '{pattern}' found {len(matches)} matches")
             if matches:
-                for match in matches[:3]:  # Show first 3
-                    print(f"  Match: '{match.group(0).strip()}' -> Question {match.group(1)}")
+                if DEBUG:
+                    for match in matches[:3]:  # Show first 3
+                        print(f"  Match: '{match.group(0).strip()}' -> Question {match.group(1)}")
                 sections = matches
                 break
     
@@ -54,18 +61,20 @@ def test_regex_parsing():
         # Extract the content between sections
         question_content = content[start_pos:end_pos].strip()
         
-        print(f"\nQuestion {question_num}:")
-        print(f"  Content length: {len(question_content)}")
-        print(f"  First 200 chars: {question_content[:200]}...")
+        if DEBUG:
+            print(f"\nQuestion {question_num}:")
+            print(f"  Content length: {len(question_content)}")
+            print(f"  First 200 chars: {question_content[:200]}...")
         
         # Look for enumerated parts like (a), (b) or \item[(a)]
         part_pattern = r'\\item\[?\(?([a-z])\)?\]?|^\s*\(?([a-z])\)\s*'
         part_matches = list(re.finditer(part_pattern, question_content, re.MULTILINE | re.IGNORECASE))
         
-        print(f"  Found {len(part_matches)} parts")
-        for j, part_match in enumerate(part_matches):
-            part_id = part_match.group(1) or part_match.group(2)
-            print(f"    Part {part_id}: '{part_match.group(0).strip()}'")
+        if DEBUG:
+            print(f"  Found {len(part_matches)} parts")
+            for j, part_match in enumerate(part_matches):
+                part_id = part_match.group(1) or part_match.group(2)
+                print(f"    Part {part_id}: '{part_match.group(0).strip()}'")
 
 if __name__ == "__main__":
-    test_regex_parsing()
+    test_regex_parsing(read_document('test_assignment.tex'))
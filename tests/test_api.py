@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
 import requests
-import json
+import orjson
+from requests_toolbelt import MultipartEncoder
+
+from documents import TEST_DIR, read_document
 
 def test_parse_api():
     # First, let's get a token by logging in
@@ -10,8 +13,11 @@ def test_parse_api():
         "password": "password123"
     }
     
+    # One session for both calls, so the upload reuses the login's connection
+    session = requests.Session()
+    
     try:
-        login_response = requests.post("http://localhost:8000/api/auth/login", data=login_data)
+        login_response = session.post("http://localhost:8000/api/auth/login", data=login_data)
         if login_response.status_code == 200:
             token = login_response.json().get("access_token")
             print("Login successful, got token")
@@ -23,37 +29,27 @@ def test_parse_api():
         return
     
     # Now test the parse endpoint
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
+    session.headers.update({"Authorization": f"Bearer {token}"})
     
     # Read test files
     files = {}
-    try:
-        with open('test_assignment.tex', 'rb') as f:
-            files['assignment_file'] = ('test_assignment.tex', f.read(), 'text/plain')
-    except:
-        pass
-        
-    try:
-        with open('test_answer_key.tex', 'rb') as f:
-            files['answer_key_file'] = ('test_answer_key.tex', f.read(), 'text/plain')
-    except:
-        pass
-        
-    try:
-        with open('test_rubric.tex', 'rb') as f:
-            files['rubric_file'] = ('test_rubric.tex', f.read(), 'text/plain')
-    except:
-        pass
+    for field, name in (
+        ('assignment_file', 'test_assignment.tex'),
+        ('answer_key_file', 'test_answer_key.tex'),
+        ('rubric_file', 'test_rubric.tex'),
+    ):
+        if (TEST_DIR / name).exists():
+            files[field] = (name, read_document(name).encode(), 'text/plain')
     
     print(f"Uploading {len(files)} files...")
     
     try:
-        response = requests.post(
+        # Stream the multipart body part by part instead of building it in memory first
+        body = MultipartEncoder(fields=files)
+        response = session.post(
             "http://localhost:8000/api/assignments/parse-files",
-            headers=headers,
-            files=files
+            data=body,
+            headers={"Content-Type": body.content_type}
         )
         
         print(f"Response status: {response.status_code}")
@@ -61,9 +57,9 @@ def test_parse_api():
         print(f"Response content: {response.text}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print("\nParsed data:")
-            print(json.dumps(data, indent=2))
+            print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
         else:
             print(f"Error: {response.text}")
             
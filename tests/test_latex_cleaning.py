@@ -2,27 +2,26 @@
 
 import re
 
+from documents import read_document
+
+# Preamble lines and document environment tags, fused into one alternation so the
+# content is scanned and copied once
+_STRIP_RE = re.compile(
+    r'\\(?:documentclass|usepackage|title|author|date|maketitle)[^\n]*\n'
+    r'|\\(?:begin|end)\{document\}'
+)
+
+# Question section headings, e.g. \section{Question 2}
+_SECTION_RE = re.compile(r'\\section\{(?:Question\s*|Q|Problem\s*)(\d+)\}', re.IGNORECASE)
+
 def clean_latex_content(content):
     """Clean LaTeX content by removing common preamble and document structure"""
     
-    # Remove document class and preamble
-    content = re.sub(r'\\documentclass.*?\n', '', content)
-    content = re.sub(r'\\usepackage.*?\n', '', content, flags=re.MULTILINE)
-    content = re.sub(r'\\title.*?\n', '', content)
-    content = re.sub(r'\\author.*?\n', '', content)
-    content = re.sub(r'\\date.*?\n', '', content)
-    content = re.sub(r'\\maketitle.*?\n', '', content)
-    
-    # Remove document environment tags
-    content = re.sub(r'\\begin\{document\}', '', content)
-    content = re.sub(r'\\end\{document\}', '', content)
-    
-    return content.strip()
+    # Remove document class, preamble and document environment tags
+    return _STRIP_RE.sub('', content).strip()
 
-def test_latex_cleaning():
-    # Read the test assignment file
-    with open('test_assignment.tex', 'r') as f:
-        original_content = f.read()
+def test_latex_cleaning(assignment_tex):
+    original_content = assignment_tex
     
     print("Original content length:", len(original_content))
     print("Original first 300 chars:")
@@ -38,12 +37,12 @@ def test_latex_cleaning():
     print("\n" + "="*50 + "\n")
     
     # Test regex on cleaned content
-    section_pattern = r'\\section\{(?:Question\s*|Q|Problem\s*)(\d+)\}'
-    sections = list(re.finditer(section_pattern, cleaned_content, re.IGNORECASE))
+    # Report matches as they are found; the count comes last
+    count = 0
+    for count, match in enumerate(_SECTION_RE.finditer(cleaned_content), 1):
+        print(f"Section {count}: Question {match.group(1)} at position {match.start()}-{match.end()}")
     
-    print(f"Found {len(sections)} sections in cleaned content")
-    for i, match in enumerate(sections):
-        print(f"Section {i+1}: Question {match.group(1)} at position {match.start()}-{match.end()}")
+    print(f"Found {count} sections in cleaned content")
 
 if __name__ == "__main__":
-    test_latex_cleaning()
+    test_latex_cleaning(read_document('test_assignment.tex'))
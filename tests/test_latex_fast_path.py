@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import string
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app.services.latex_parser import LatexParser, _LATEX_CONVERTER, _LATEX_MARKUP_RE
+
+# Characters plain answers are made of, weighted towards the punctuation pylatexenc
+# treats specially (quotes, dashes, the !` and ?` ligatures)
+ALPHABET = string.printable + "!?`'-" * 4 + "é—“”ß"
+
+def test_latex_fast_path(samples=50_000, seed=0):
+    """Text the markup prefilter lets through must convert to itself under pylatexenc"""
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(samples):
+        text = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 24)))
+        if _LATEX_MARKUP_RE.search(text):
+            continue
+
+        assert _LATEX_CONVERTER.latex_to_text(text) == text, repr(text)
+        checked += 1
+
+    print(f"Checked {checked} plain strings against pylatexenc")
+
+def test_latex_fast_path_ligatures():
+    """Spanish punctuation ligatures go through pylatexenc, so they come out converted"""
+    parser = LatexParser()
+    assert parser._latex_to_text("Why?` Yes!`") == _LATEX_CONVERTER.latex_to_text("Why?` Yes!`")
+
+if __name__ == "__main__":
+    test_latex_fast_path()
+    test_latex_fast_path_ligatures()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app.services.latex_parser import LatexParser
+from documents import read_document
+
+# Section headers on preamble lines, which the text path strips before finding sections
+PREAMBLE_SECTIONS = (
+    "\\documentclass{article}\n"
+    "\\title{Homework \\section{Question 9}}\n"
+    "\\begin{document}\n"
+    "\\maketitle\n"
+    "\\section{Q1}\n"
+    "First answer\n"
+    "\\date{today} \\section{Q2}\n"
+    "\\section{Q3}\n"
+    "Third answer\n"
+    "\\end{document}\n"
+)
+
+def assert_same_questions(latex):
+    """Large files are parsed from their mapped bytes; the result must match the text path"""
+    parser = LatexParser()
+    for newline in ('\n', '\r\n', '\r'):
+        raw = latex.replace('\n', newline).encode('utf-8')
+        assert parser._extract_questions_from_buffer(raw) == parser._extract_questions(parser._decode(raw))
+
+def test_mmap_path_matches_text_path(assignment_tex, answer_key_tex, rubric_tex):
+    for document in (assignment_tex, answer_key_tex, rubric_tex):
+        assert_same_questions(document)
+
+def test_mmap_path_skips_preamble_sections():
+    assert_same_questions(PREAMBLE_SECTIONS)
+    assert sorted(LatexParser()._extract_questions_from_buffer(PREAMBLE_SECTIONS.encode())) == ['q1', 'q3']
+
+if __name__ == "__main__":
+    test_mmap_path_matches_text_path(
+        read_document('test_assignment.tex'),
+        read_document('test_answer_key.tex'),
+        read_document('test_rubric.tex'),
+    )
+    test_mmap_path_skips_preamble_sections()
@@ -5,17 +5,10 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
 from backend.app.services.llm_service import parse_assignment_documents
+from documents import read_document
 
-def test_parsing():
-    # Read the test files
-    with open('test_assignment.tex', 'r') as f:
-        assignment_content = f.read()
-    
-    with open('test_answer_key.tex', 'r') as f:
-        answer_key_content = f.read()
-    
-    with open('test_rubric.tex', 'r') as f:
-        rubric_content = f.read()
+def test_parsing(assignment_tex, answer_key_tex, rubric_tex):
+    assignment_content, answer_key_content, rubric_content = assignment_tex, answer_key_tex, rubric_tex
     
     print("Testing parsing with the following content lengths:")
     print(f"Assignment: {len(assignment_content)} chars")
@@ -40,22 +33,26 @@ def test_parsing():
                 print(f"  Document type: {result.document_type}")
                 print(f"  Number of questions: {len(result.questions)}")
                 
+                # Collect the listing and write it in one go
+                out = []
                 for i, question in enumerate(result.questions):
-                    print(f"  Question {question.id}:")
-                    print(f"    Max points: {question.max_points}")
-                    print(f"    Question text: {question.question_text[:100]}...")
-                    print(f"    Answer text: {question.answer_text[:100]}...")
-                    print(f"    Rubric text: {question.rubric_text[:100]}...")
-                    print(f"    Parts: {len(question.parts)}")
+                    out.append(f"  Question {question.id}:")
+                    out.append(f"    Max points: {question.max_points}")
+                    out.append(f"    Question text: {question.question_text[:100]}...")
+                    out.append(f"    Answer text: {question.answer_text[:100]}...")
+                    out.append(f"    Rubric text: {question.rubric_text[:100]}...")
+                    out.append(f"    Parts: {len(question.parts)}")
                     
                     for part in question.parts:
-                        print(f"      Part {part.id}: {part.max_points} points")
+                        out.append(f"      Part {part.id}: {part.max_points} points")
                         if part.question_text:
-                            print(f"        Question: {part.question_text[:50]}...")
+                            out.append(f"        Question: {part.question_text[:50]}...")
                         if part.answer_text:
-                            print(f"        Answer: {part.answer_text[:50]}...")
+                            out.append(f"        Answer: {part.answer_text[:50]}...")
                         if part.rubric_text:
-                            print(f"        Rubric: {part.rubric_text[:50]}...")
+                            out.append(f"        Rubric: {part.rubric_text[:50]}...")
+                if out:
+                    sys.stdout.write('\n'.join(out) + '\n')
             else:
                 print(f"\n{key.upper()}: No content")
                 
@@ -65,4 +62,8 @@ def test_parsing():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    test_parsing()
+    test_parsing(
+        read_document('test_assignment.tex'),
+        read_document('test_answer_key.tex'),
+        read_document('test_rubric.tex')
+    )
@@ -2,6 +2,7 @@
 
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
 # Set up environment
@@ -11,19 +12,15 @@ os.environ['SECRET_KEY'] = 'test-secret'
 os.environ['REDIS_URL'] = 'redis://localhost:6379/0'
 
 from backend.app.services.llm_service import LLMService
+from documents import read_document
 
-def test_parsing():
+# Per-question and per-part detail; off by default so runs only print the summaries
+DEBUG = os.environ.get('PARSE_DEBUG') == '1'
+
+def test_parsing(assignment_tex, answer_key_tex, rubric_tex):
     print("Testing LLM service parsing...")
     
-    # Read the test files
-    with open('test_assignment.tex', 'r') as f:
-        assignment_content = f.read()
-    
-    with open('test_answer_key.tex', 'r') as f:
-        answer_key_content = f.read()
-    
-    with open('test_rubric.tex', 'r') as f:
-        rubric_content = f.read()
+    assignment_content, answer_key_content, rubric_content = assignment_tex, answer_key_tex, rubric_tex
     
     print("File lengths:")
     print(f"  Assignment: {len(assignment_content)} chars")
@@ -41,37 +38,49 @@ def test_parsing():
         "rubric": (rubric_content, "rubric")
     }
     
-    for doc_name, (content, doc_type) in documents.items():
+    # Each parse is an independent LLM call, so run them together and print in order
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = {
+            doc_name: executor.submit(llm_service.parse_document, content, doc_type)
+            for doc_name, (content, doc_type) in documents.items()
+        }
+    
+    for doc_name, future in futures.items():
         print(f"Parsing {doc_name}...")
         try:
-            result = llm_service.parse_document(content, doc_type)
+            result = future.result()
             
             print(f"  Document type: {result.document_type}")
             print(f"  Questions found: {len(result.questions)}")
             
             total_parts = sum(len(q.parts) for q in result.questions)
-            total_points = sum(q.max_points for q in result.questions) + sum(sum(p.max_points for p in q.parts) for q in result.questions)
+            total_points = sum(q.max_points + sum(p.max_points for p in q.parts) for q in result.questions)
             
             print(f"  Total parts: {total_parts}")
             print(f"  Total points: {total_points}")
             
-            for i, question in enumerate(result.questions):
-                print(f"    Q{question.id}: {question.max_points} pts, {len(question.parts)} parts")
-                if question.question_text:
-                    print(f"      Question: {question.question_text[:100]}...")
-                if question.answer_text:
-                    print(f"      Answer: {question.answer_text[:100]}...")
-                if question.rubric_text:
-                    print(f"      Rubric: {question.rubric_text[:100]}...")
-                
-                for part in question.parts:
-                    print(f"        Part {part.id}: {part.max_points} pts")
-                    if part.question_text:
-                        print(f"          Question: {part.question_text[:80]}...")
-                    if part.answer_text:
-                        print(f"          Answer: {part.answer_text[:80]}...")
-                    if part.rubric_text:
-                        print(f"          Rubric: {part.rubric_text[:80]}...")
+            if DEBUG:
+                # Collect the listing and write it in one go
+                out = []
+                for i, question in enumerate(result.questions):
+                    out.append(f"    Q{question.id}: {question.max_points} pts, {len(question.parts)} parts")
+                    if question.question_text:
+                        out.append(f"      Question: {question.question_text[:100]}...")
+                    if question.answer_text:
+                        out.append(f"      Answer: {question.answer_text[:100]}...")
+                    if question.rubric_text:
+                        out.append(f"      Rubric: {question.rubric_text[:100]}...")
+                    
+                    for part in question.parts:
+                        out.append(f"        Part {part.id}: {part.max_points} pts")
+                        if part.question_text:
+                            out.append(f"          Question: {part.question_text[:80]}...")
+                        if part.answer_text:
+                            out.append(f"          Answer: {part.answer_text[:80]}...")
+                        if part.rubric_text:
+                            out.append(f"          Rubric: {part.rubric_text[:80]}...")
+                if out:
+                    sys.stdout.write('\n'.join(out) + '\n')
             print()
             
         except Exception as e:
@@ -81,4 +90,8 @@ def test_parsing():
             print()
 
 if __name__ == "__main__":
-    test_parsing()
+    test_parsing(
+        read_document('test_assignment.tex'),
+        read_document('test_answer_key.tex'),
+        read_document('test_rubric.tex')
+    )